@@ -2,20 +2,42 @@
 # ===========================================
 # Streamlit-приложение (упрощённый UI + панель параметров):
 # - Сбор отзывов App Store (Apple RSS JSON) по всем странам
+# - Асинхронный движок: страны обходятся параллельно (httpx + семафор на хост)
 # - Фильтр: последние N дней + только RU (эвристика по доле кириллицы)
 # - Тэгирование тем сохраняется в данных/CSV
 # - UI: заголовок, панель параметров, кнопка запуска, прогресс, результат + таблица, скачать CSV
 # - ЛОГ полностью убран
 # ===========================================
 
+import os
 import re
-import time
 import csv
+import json
+import math
+import time
+import asyncio
+import heapq
+import gzip
+import zlib
+import base64
+import io
 import hashlib
+import itertools
 import random
+import sqlite3
+import threading
+import queue
+import uuid
+import importlib.util
+import concurrent.futures
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass, field, replace
 from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlencode, urlsplit
 
-import requests
+import httpx
 import pandas as pd
 import streamlit as st
 from dateutil.relativedelta import relativedelta
@@ -52,39 +74,1092 @@ STORE_FRONTS = [
 
 
 # -----------------------------
-# Надёжные HTTP-запросы: retry + экспоненциальная пауза
+# Асинхронный HTTP-движок: общий клиент + семафор на хост
+# -----------------------------
+# HTTP/2 и brotli — только если установлены пакеты h2 / brotli, иначе HTTP/1.1 + gzip
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+BROTLI_AVAILABLE = any(importlib.util.find_spec(m) is not None for m in ("brotli", "brotlicffi"))
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome Safari",
+    "Accept": "application/json,text/plain,*/*",
+    "Accept-Encoding": "br, gzip, deflate" if BROTLI_AVAILABLE else "gzip, deflate",
+}
+
+# -----------------------------
+# AIMD-регулятор темпа: +step при 200, ×factor при 429/503
+# -----------------------------
+class AimdRateController:
+    def __init__(
+        self,
+        initial_rate: float = 4.0,
+        min_rate: float = 0.5,
+        max_rate: float = 20.0,
+        increase_step: float = 0.5,
+        decrease_factor: float = 0.5,
+        decrease_cooldown: float = 1.0,
+    ):
+        self.rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.decrease_cooldown = decrease_cooldown
+        self._last_grant = float("-inf")
+        self._last_decrease = float("-inf")
+        self._waiters: list[tuple[float, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._dispatcher: asyncio.Task | None = None
+
+    async def acquire(self, priority: float = 0.0):
+        # запросы проходят по одному с интервалом 1/rate; из очереди первым выходит
+        # самый ценный (priority), при равной ценности — кто раньше встал
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        heapq.heappush(self._waiters, (-priority, next(self._seq), fut))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = loop.create_task(self._dispatch())
+        await fut
+
+    async def _dispatch(self):
+        # интервал пересчитывается короткими шагами, чтобы изменение темпа сразу влияло на очередь
+        loop = asyncio.get_running_loop()
+        while self._waiters:
+            wait = self._last_grant + 1.0 / self.rate - loop.time()
+            if wait > 0:
+                await asyncio.sleep(min(wait, 0.1))
+                continue
+            _, _, fut = heapq.heappop(self._waiters)
+            if fut.done():
+                continue
+            self._last_grant = loop.time()
+            fut.set_result(None)
+
+    def on_success(self):
+        # +increase_step запросов/сек примерно за каждую секунду успешных ответов
+        self.rate = min(self.max_rate, self.rate + self.increase_step / self.rate)
+
+    def on_throttle(self):
+        # пачка 429 от уже летящих запросов режет темп один раз, а не N раз
+        now = asyncio.get_running_loop().time()
+        if now - self._last_decrease < self.decrease_cooldown:
+            return
+        self._last_decrease = now
+        self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+
+
+# -----------------------------
+# Circuit breaker на пару (страна, эндпоинт): после N сбоев подряд — пропуск до конца прогона
+# -----------------------------
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 3):
+        self.failure_threshold = failure_threshold
+        self._failures: dict[tuple[str, str], int] = {}
+        self._last_reason: dict[tuple[str, str], str] = {}
+        self._open: set[tuple[str, str]] = set()
+
+    def is_open(self, key: tuple[str, str]) -> bool:
+        return key in self._open
+
+    def record_success(self, key: tuple[str, str]):
+        self._failures.pop(key, None)
+        self._last_reason.pop(key, None)
+
+    def note(self, key: tuple[str, str], reason: str):
+        # причина без счёта сбоя (например, 429) — чтобы объяснить пропуск
+        self._last_reason[key] = reason
+
+    def record_failure(self, key: tuple[str, str], reason: str):
+        self._failures[key] = self._failures.get(key, 0) + 1
+        self._last_reason[key] = reason
+        if self._failures[key] >= self.failure_threshold:
+            self._open.add(key)
+
+    def describe(self, key: tuple[str, str]) -> str | None:
+        reason = self._last_reason.get(key)
+        if reason is None:
+            return None
+        if key in self._open:
+            return f"circuit open ({key[1]}): {reason}"
+        return f"{key[1]}: {reason}"
+
+
+# -----------------------------
+# Бюджет повторов на весь прогон: в скользящем окне повторов не больше доли от первых попыток
+# (плюс небольшой минимум) — при троттлинге повторы не умножают нагрузку на сервер
+# -----------------------------
+RETRY_BUDGET_WINDOW = 10.0
+RETRY_BUDGET_RATIO = 0.2
+RETRY_BUDGET_MIN_PER_SEC = 0.1
+
+class RetryBudget:
+    def __init__(
+        self,
+        ratio: float = RETRY_BUDGET_RATIO,
+        min_per_sec: float = RETRY_BUDGET_MIN_PER_SEC,
+        window: float = RETRY_BUDGET_WINDOW,
+    ):
+        self.ratio = ratio
+        self.min_per_sec = min_per_sec
+        self.window = window
+        self._first: deque = deque()
+        self._retries: deque = deque()
+
+    def _trim(self, now: float):
+        for q in (self._first, self._retries):
+            while q and q[0] <= now - self.window:
+                q.popleft()
+
+    def record_attempt(self):
+        self._first.append(time.monotonic())
+
+    def try_spend(self) -> bool:
+        # место под повтор занимается сразу, чтобы пачка одновременных сбоев не прошла вся
+        now = time.monotonic()
+        self._trim(now)
+        if len(self._retries) >= self.min_per_sec * self.window + self.ratio * len(self._first):
+            return False
+        self._retries.append(now)
+        return True
+
+
+# -----------------------------
+# Задержки: гистограммы на (эндпоинт, страна) с логарифмическими корзинами, живут между прогонами.
+# Из них — таймауты подключения/чтения, бюджет времени на вызов и порог хеджирования
+# -----------------------------
+LATENCY_BUCKET_BASE = 0.005      # 5 мс — верхняя граница первой корзины
+LATENCY_BUCKETS_PER_DOUBLING = 4
+LATENCY_BUCKETS = 64             # последняя корзина — всё дольше ~2.5 мин
+LATENCY_MIN_SAMPLES = 20
+LATENCY_MAX_WEIGHT = 2000.0      # сверх этого старые наблюдения ужимаются — свежие весят больше
+
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 25.0
+MIN_CONNECT_TIMEOUT = 1.0
+MIN_READ_TIMEOUT = 2.0
+MIN_CALL_BUDGET = 10.0
+MAX_CALL_BUDGET = 90.0
+
+def _latency_bucket(seconds: float) -> int:
+    if seconds <= LATENCY_BUCKET_BASE:
+        return 0
+    return min(LATENCY_BUCKETS - 1, int(math.log2(seconds / LATENCY_BUCKET_BASE) * LATENCY_BUCKETS_PER_DOUBLING) + 1)
+
+def _bucket_upper(i: int) -> float:
+    return LATENCY_BUCKET_BASE * 2 ** (i / LATENCY_BUCKETS_PER_DOUBLING)
+
+def _clamp(value: float, low: float, high: float) -> float:
+    return max(low, min(high, value))
+
+class LatencyHistograms:
+    def __init__(self, conn: sqlite3.Connection | None = None):
+        self.conn = conn
+        self._counts: dict[tuple[str, str], list[float]] = {}
+        self._by_endpoint: dict[str, list[float]] = {}
+        self._delta: dict[tuple[str, str], list[float]] = {}
+        if conn is None:
+            return
+        with conn:
+            # latency_histograms копила задержки вместе с ожиданием слота хоста — такие выборки не годятся
+            conn.execute("DROP TABLE IF EXISTS latency_histograms")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS wire_latency_histograms ("
+                "endpoint TEXT, country TEXT, counts TEXT, updated_at REAL, PRIMARY KEY (endpoint, country))"
+            )
+        for endpoint, country, counts in conn.execute("SELECT endpoint, country, counts FROM wire_latency_histograms"):
+            for i, n in enumerate(json.loads(counts)[:LATENCY_BUCKETS]):
+                self._add((endpoint, country), i, n)
+
+    def _add(self, key: tuple[str, str], bucket: int, n: float):
+        self._counts.setdefault(key, [0.0] * LATENCY_BUCKETS)[bucket] += n
+        self._by_endpoint.setdefault(key[0], [0.0] * LATENCY_BUCKETS)[bucket] += n
+
+    def observe(self, endpoint: str, country: str, seconds: float):
+        bucket = _latency_bucket(seconds)
+        self._add((endpoint, country), bucket, 1.0)
+        self._delta.setdefault((endpoint, country), [0.0] * LATENCY_BUCKETS)[bucket] += 1.0
+
+    def quantile(self, endpoint: str, country: str, q: float) -> float | None:
+        # своя гистограмма страны, пока она мала — общая по эндпоинту; оценка сверху (граница корзины)
+        for counts in (self._counts.get((endpoint, country)), self._by_endpoint.get(endpoint)):
+            total = sum(counts) if counts else 0.0
+            if total < LATENCY_MIN_SAMPLES:
+                continue
+            acc = 0.0
+            for i, n in enumerate(counts):
+                acc += n
+                if acc >= q * total:
+                    return _bucket_upper(i)
+        return None
+
+    def timeouts(self, endpoint: str, country: str) -> tuple[httpx.Timeout, float]:
+        # (таймауты одной попытки, бюджет на весь вызов со всеми повторами).
+        # Подключение — пара RTT, поэтому от медианы; чтение — с запасом от p99
+        p50 = self.quantile(endpoint, country, 0.5)
+        p99 = self.quantile(endpoint, country, 0.99)
+        if p50 is None or p99 is None:
+            connect, read = DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT
+        else:
+            connect = _clamp(3 * p50, MIN_CONNECT_TIMEOUT, DEFAULT_CONNECT_TIMEOUT)
+            read = _clamp(4 * p99, MIN_READ_TIMEOUT, DEFAULT_READ_TIMEOUT)
+        budget = _clamp(3 * (connect + read), MIN_CALL_BUDGET, MAX_CALL_BUDGET)
+        # ожидание свободного соединения в пуле — не про здоровье витрины, его не ужимаем
+        return httpx.Timeout(read, connect=connect, pool=DEFAULT_READ_TIMEOUT), budget
+
+    def flush(self):
+        # дописываем к тому, что в базе сейчас (параллельный процесс мог обновить её за прогон)
+        if self.conn is None or not self._delta:
+            return
+        with self.conn:
+            for (endpoint, country), delta in self._delta.items():
+                row = self.conn.execute(
+                    "SELECT counts FROM wire_latency_histograms WHERE endpoint = ? AND country = ?", (endpoint, country),
+                ).fetchone()
+                stored = json.loads(row[0])[:LATENCY_BUCKETS] if row else []
+                stored += [0.0] * (LATENCY_BUCKETS - len(stored))
+                merged = [a + b for a, b in zip(stored, delta)]
+                total = sum(merged)
+                if total > LATENCY_MAX_WEIGHT:
+                    merged = [n * LATENCY_MAX_WEIGHT / total for n in merged]
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO wire_latency_histograms (endpoint, country, counts, updated_at) VALUES (?, ?, ?, ?)",
+                    (endpoint, country, json.dumps([round(n, 3) for n in merged]), time.time()),
+                )
+        self._delta.clear()
+
+
+# -----------------------------
+# Хеджирование: если ответ дольше p95 (эндпоинт, страна) — дублирующий запрос, берётся первый ответ.
+# Дубли идут через тот же AIMD-темп и ограничены бюджетом (доля от всех запросов)
+# -----------------------------
+HEDGE_QUANTILE = 0.95
+HEDGE_BUDGET_RATIO = 0.05
+HEDGE_BUDGET_FLOOR = 2
+
+def _percentile(values, q: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+@dataclass
+class RunStats:
+    requests: int = 0
+    retries: int = 0
+    lookup_cache_hits: int = 0
+    requests_saved: int = 0
+    pages_cancelled: int = 0
+    known_reached: int = 0
+    bytes_wire: int = 0
+    bytes_decoded: int = 0
+    http_cache_hits: int = 0
+    http_cache_revalidated: int = 0
+    http_cache_misses: int = 0
+    http_version: str | None = None
+    hedges_fired: int = 0
+    hedges_won: int = 0
+    calls_timed_out: int = 0
+    budget_denied: int = 0
+    early_stops: int = 0
+    early_stop_requests_saved: int = 0
+    early_stop_expected_missed: float = 0.0
+    resumed_countries: int = 0
+    resumed_pages: int = 0
+    cancelled: bool = False
+    shared_rate_wait_s: float = 0.0
+    retries_denied: int = 0
+    skipped: dict[str, str] = field(default_factory=dict)
+    coverage: dict[str, str] = field(default_factory=dict)
+    requests_by_country: dict[str, int] = field(default_factory=dict)
+    # задержки вызовов (мс): фактические и какими они были бы без хеджирования
+    latency_ms: list[float] = field(default_factory=list)
+    latency_unhedged_ms: list[float] = field(default_factory=list)
+
+    def hedge_p99_saved_ms(self) -> float:
+        # оценка снизу: отменённые в конце прогона "медленные" запросы учтены временем до отмены
+        actual = _percentile(self.latency_ms, 0.99)
+        unhedged = _percentile(self.latency_unhedged_ms, 0.99)
+        if actual is None or unhedged is None:
+            return 0.0
+        return max(0.0, unhedged - actual)
+
+    def as_dict(self) -> dict:
+        d = asdict(self)
+        d.pop("latency_ms")
+        d.pop("latency_unhedged_ms")
+        d["hedge_p99_saved_ms"] = round(self.hedge_p99_saved_ms(), 1)
+        first_attempts = self.requests - self.retries
+        d["retry_spend"] = round(self.retries / first_attempts, 3) if first_attempts else 0.0
+        return d
+
+
+@dataclass
+class FetchContext:
+    client: httpx.AsyncClient
+    concurrency: int = 8
+    rate: AimdRateController = field(default_factory=AimdRateController)
+    breaker: CircuitBreaker = field(default_factory=CircuitBreaker)
+    retry_budget: RetryBudget = field(default_factory=RetryBudget)
+    shared_rate: "SharedRateLimiter | None" = None
+    allocator: "RequestAllocator | None" = None
+    cancel: "CancelToken | None" = None
+    stats: RunStats = field(default_factory=RunStats)
+    lookup_cache: "LookupCache | None" = None
+    http_cache: "HttpCache | None" = None
+    state_db: sqlite3.Connection | None = None
+    # ценность запросов по стране для очереди темпа и дедлайн прогона (loop.time())
+    priorities: dict[str, float] = field(default_factory=dict)
+    deadline_at: float | None = None
+    host_semaphores: dict[str, asyncio.Semaphore] = field(default_factory=dict)
+    hedging: bool = False
+    latency: LatencyHistograms = field(default_factory=LatencyHistograms)
+    # проигравшие хедж исходные запросы дорабатывают в фоне — ради честной оценки выигрыша
+    background: set[asyncio.Task] = field(default_factory=set)
+
+    def host_slot(self, url: str) -> asyncio.Semaphore:
+        # не больше concurrency одновременных запросов к одному хосту
+        host = urlsplit(url).netloc
+        sem = self.host_semaphores.get(host)
+        if sem is None:
+            sem = self.host_semaphores[host] = asyncio.Semaphore(self.concurrency)
+        return sem
+
+
+# -----------------------------
+# Надёжные HTTP-запросы: retry + экспоненциальная пауза (без блокировки потока);
+# 429/503 не спят сами, а замедляют общий AIMD-темп и уважают Retry-After
 # -----------------------------
-def request_with_retry(
-    session: requests.Session,
+def parse_retry_after(value: str | None) -> float | None:
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        dt = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return max(0.0, (dt - datetime.now(timezone.utc)).total_seconds())
+
+async def _pause(ctx: FetchContext, seconds: float) -> bool:
+    # пауза, которую прерывает отмена сбора; False — сбор отменён
+    if ctx.cancel is None:
+        await asyncio.sleep(seconds)
+        return True
+    return await ctx.cancel.sleep(seconds)
+
+async def _race_cancel(ctx: FetchContext, aw):
+    # ожидание (очередь темпа, сетевой запрос) не переживает отмену сбора
+    if ctx.cancel is None:
+        return await aw
+    if ctx.cancel.cancelled:
+        aw.close()
+        raise ScrapeCancelled()
+    task = asyncio.ensure_future(aw)
+    stop = asyncio.ensure_future(ctx.cancel.wait())
+    try:
+        await asyncio.wait({task, stop}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        stop.cancel()
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+    if task.cancelled():
+        raise ScrapeCancelled()
+    return task.result()
+
+async def _acquire_shared(ctx: FetchContext):
+    if ctx.shared_rate is not None:
+        wait = await ctx.shared_rate.reserve()
+        ctx.stats.shared_rate_wait_s += wait
+        if wait > 0 and not await _pause(ctx, wait):
+            raise ScrapeCancelled()
+
+async def _first_ok(primary: asyncio.Task, hedge: asyncio.Task) -> asyncio.Task:
+    # первый ответ без исключения; если упали оба — исключение исходного запроса
+    pending = {primary, hedge}
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for t in (primary, hedge):
+            if t in done and t.exception() is None:
+                return t
+    raise primary.exception()
+
+def _count_request(ctx: FetchContext, country: str | None):
+    ctx.stats.requests += 1
+    if country:
+        by_country = ctx.stats.requests_by_country
+        by_country[country] = by_country.get(country, 0) + 1
+
+@dataclass
+class _CallClock:
+    # бюджет вызова (все попытки) тратится только на время в сети и паузы между попытками:
+    # ожидание в очереди темпа, общем bucket и слоте хоста сдвигает дедлайн (это не вина витрины)
+    budget: float | None = None
+    deadline: float | None = None
+    queued_at: float = 0.0
+
+    def sent(self, now: float):
+        if self.budget is not None:
+            self.deadline = (self.deadline or self.queued_at + self.budget) + (now - self.queued_at)
+
+async def _hedged_get(
+    ctx: FetchContext,
+    url: str,
+    params: dict | None,
+    headers: dict | None,
+    timeout,
+    latency_key: tuple[str, str],
+    country: str | None = None,
+    clock: _CallClock | None = None,
+) -> httpx.Response:
+    loop = asyncio.get_running_loop()
+
+    async def send_hedge() -> httpx.Response:
+        # дубль первым проходит очередь темпа и не ждёт слота хоста: иначе он опоздает
+        # за обычными запросами; сверх concurrency его держит бюджет хеджей
+        await ctx.rate.acquire(math.inf)
+        await _acquire_shared(ctx)
+        return await ctx.client.get(url, params=params, headers=headers, timeout=timeout)
+
+    def record(unhedged_s: float, actual_s: float):
+        ctx.latency.observe(*latency_key, unhedged_s)
+        ctx.stats.latency_unhedged_ms.append(unhedged_s * 1000)
+        ctx.stats.latency_ms.append(actual_s * 1000)
+
+    # исходный запрос уходит, только получив слот хоста; слот отпускается, когда запрос завершён
+    # (в том числе доработав в фоне после проигранного хеджа). Задержки и бюджет вызова
+    # считаются с момента отправки — в гистограммы попадает только время в сети
+    slot = ctx.host_slot(url)
+    await slot.acquire()
+    primary = asyncio.ensure_future(ctx.client.get(url, params=params, headers=headers, timeout=timeout))
+    primary.add_done_callback(lambda _: slot.release())
+    sent_at = loop.time()
+    if clock is not None:
+        clock.sent(sent_at)
+    hedge = None
+    try:
+        async with asyncio.timeout_at(clock.deadline if clock is not None else None):
+            # таймер дубля — с момента отправки: ожидание слота — не медленный сервер, его хеджировать нечем
+            hedge_after = ctx.latency.quantile(*latency_key, HEDGE_QUANTILE) if ctx.hedging else None
+            if hedge_after is not None and (ctx.deadline_at is None or sent_at + hedge_after < ctx.deadline_at):
+                done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+                budget = HEDGE_BUDGET_FLOOR + HEDGE_BUDGET_RATIO * (ctx.stats.requests - ctx.stats.hedges_fired)
+                # дубль — полноценный запрос: считается в requests и упирается в бюджет прогона, если он задан
+                allowed = ctx.allocator is None or ctx.allocator.remaining() > 0
+                if not done and allowed and ctx.stats.hedges_fired < budget:
+                    ctx.stats.hedges_fired += 1
+                    _count_request(ctx, country)
+                    hedge = asyncio.ensure_future(send_hedge())
+
+            if hedge is None:
+                r = await primary
+                elapsed = loop.time() - sent_at
+                record(elapsed, elapsed)
+                return r
+
+            winner = await _first_ok(primary, hedge)
+            elapsed = loop.time() - sent_at
+            if winner is primary:
+                hedge.cancel()
+                record(elapsed, elapsed)
+                return primary.result()
+
+            ctx.stats.hedges_won += 1
+            ctx.stats.latency_ms.append(elapsed * 1000)
+            if primary.done():
+                ctx.latency.observe(*latency_key, elapsed)
+                ctx.stats.latency_unhedged_ms.append(elapsed * 1000)
+            else:
+                # исходный запрос уже на сервере — даём ему доработать, чтобы знать, сколько сэкономили
+                async def finish_primary(slow: asyncio.Task):
+                    try:
+                        r = await slow
+                        ctx.stats.bytes_wire += r.num_bytes_downloaded
+                    except httpx.HTTPError:
+                        pass
+                    finally:
+                        unhedged = loop.time() - sent_at
+                        ctx.latency.observe(*latency_key, unhedged)
+                        ctx.stats.latency_unhedged_ms.append(unhedged * 1000)
+
+                task = asyncio.ensure_future(finish_primary(primary))
+                ctx.background.add(task)
+                task.add_done_callback(ctx.background.discard)
+                primary = None
+            return winner.result()
+    finally:
+        for t in (primary, hedge):
+            if t is not None and not t.done():
+                t.cancel()
+
+async def request_with_retry(
+    ctx: FetchContext,
     url: str,
     params: dict | None = None,
-    timeout: int = 25,
-    max_retries: int = 6,
+    timeout: float | httpx.Timeout | None = None,
+    max_retries: int = 4,
     base_sleep: float = 0.75,
+    max_sleep: float = 8.0,
+    max_retry_after: float = 30.0,
     jitter: float = 0.25,
+    breaker_key: tuple[str, str] | None = None,
+    cache_policy: str | None = None,
 ):
+    # кэш: в окне свежести ответ отдаётся без сети, дальше — условный запрос с валидаторами
+    cache_key, cached, headers = None, None, None
+    if ctx.http_cache is not None and cache_policy:
+        cache_key = http_cache_key(url, params)
+        cached = ctx.http_cache.get(cache_key, HTTP_CACHE_POLICIES[cache_policy])
+        if cached is not None:
+            if cached.is_fresh:
+                ctx.stats.http_cache_hits += 1
+                return cached.to_response(url, params)
+            headers = cached.validators()
+
+    def out_of_attempts(attempt: int) -> bool:
+        # последняя попытка или открытый breaker — спать перед выходом незачем
+        return attempt + 1 >= max_retries or bool(breaker_key and ctx.breaker.is_open(breaker_key))
+
+    loop = asyncio.get_running_loop()
+    priority = ctx.priorities.get(breaker_key[0], 0.0) if breaker_key else 0.0
+    latency_key = (breaker_key[1], breaker_key[0]) if breaker_key else (cache_policy or "other", "*")
+
+    # без явного timeout — таймауты и общий бюджет вызова из гистограммы задержек (см. _CallClock)
+    clock = _CallClock()
+    if timeout is None:
+        timeout, clock.budget = ctx.latency.timeouts(*latency_key)
+
+    def past_deadline(delay: float = 0.0) -> bool:
+        limits = [d for d in (ctx.deadline_at, clock.deadline) if d is not None]
+        return bool(limits) and loop.time() + delay >= min(limits)
+
+    def give_up(attempt: int, delay: float) -> bool:
+        # бюджет повторов проверяется последним: место в нём тратится только на реальный повтор
+        if out_of_attempts(attempt) or past_deadline(delay):
+            return True
+        if not ctx.retry_budget.try_spend():
+            ctx.stats.retries_denied += 1
+            return True
+        return False
+
     for attempt in range(max_retries):
+        if ctx.cancel is not None and ctx.cancel.cancelled:
+            return None
+        if breaker_key and ctx.breaker.is_open(breaker_key):
+            return None
+        if past_deadline():
+            return None
+
+        _count_request(ctx, breaker_key[0] if breaker_key else None)
+        if attempt:
+            ctx.stats.retries += 1
+        else:
+            ctx.retry_budget.record_attempt()
+
+        sleep_s = min(max_sleep, base_sleep * (2 ** attempt)) + random.random() * jitter
         try:
-            r = session.get(url, params=params, timeout=timeout)
+            clock.queued_at = loop.time()
+            await _race_cancel(ctx, ctx.rate.acquire(priority))
+            await _acquire_shared(ctx)
+            r = await _race_cancel(ctx, _hedged_get(
+                ctx, url, params, headers, timeout, latency_key, breaker_key[0] if breaker_key else None, clock,
+            ))
             status = r.status_code
+            # num_bytes_downloaded — сжатое тело как пришло по сети, content — после распаковки
+            ctx.stats.bytes_wire += r.num_bytes_downloaded
+            ctx.stats.bytes_decoded += len(r.content)
+            ctx.stats.http_version = r.http_version
+
+            if status == 304 and cached is not None:
+                ctx.rate.on_success()
+                if breaker_key:
+                    ctx.breaker.record_success(breaker_key)
+                ctx.stats.http_cache_revalidated += 1
+                ctx.http_cache.touch(cache_key)
+                return cached.to_response(url, params)
 
             if status == 200:
+                ctx.rate.on_success()
+                if breaker_key:
+                    ctx.breaker.record_success(breaker_key)
+                if cache_key is not None:
+                    ctx.stats.http_cache_misses += 1
+                    ctx.http_cache.put(cache_key, r)
                 return r
 
-            if status in (429, 500, 502, 503, 504):
-                sleep_s = base_sleep * (2 ** attempt) + random.random() * jitter
-                time.sleep(sleep_s)
+            if status in (429, 503):
+                ctx.rate.on_throttle()
+                # 429 — сигнал общего троттлинга, а не болезни конкретной витрины,
+                # поэтому breaker считает только 503
+                if breaker_key:
+                    if status == 503:
+                        ctx.breaker.record_failure(breaker_key, "HTTP 503")
+                    else:
+                        ctx.breaker.note(breaker_key, "HTTP 429")
+                retry_after = parse_retry_after(r.headers.get("Retry-After"))
+                if (retry_after or 0) > max_retry_after or give_up(attempt, retry_after or 0):
+                    return None
+                if retry_after is None:
+                    continue
+                if not await _pause(ctx, retry_after):
+                    return None
                 continue
 
+            if status in (500, 502, 504):
+                if breaker_key:
+                    ctx.breaker.record_failure(breaker_key, f"HTTP {status}")
+                if give_up(attempt, sleep_s):
+                    return None
+                if not await _pause(ctx, sleep_s):
+                    return None
+                continue
+
+            if breaker_key:
+                ctx.breaker.record_failure(breaker_key, f"HTTP {status}")
+            return None
+
+        except ScrapeCancelled:
+            return None
+
+        except asyncio.TimeoutError:
+            # бюджет вызова исчерпан посреди попытки — дальше повторять нечем
+            ctx.stats.calls_timed_out += 1
+            if breaker_key:
+                ctx.breaker.record_failure(breaker_key, "timeout")
             return None
 
-        except requests.RequestException:
-            sleep_s = base_sleep * (2 ** attempt) + random.random() * jitter
-            time.sleep(sleep_s)
+        except httpx.HTTPError as e:
+            if breaker_key:
+                reason = "timeout" if isinstance(e, httpx.TimeoutException) else type(e).__name__
+                ctx.breaker.record_failure(breaker_key, reason)
+            if give_up(attempt, sleep_s):
+                return None
+            if not await _pause(ctx, sleep_s):
+                return None
 
     return None
 
 
+# -----------------------------
+# Транспорт: постоянный event loop в фоновом потоке + httpx-клиенты, живущие между прогонами.
+# Клиент привязан к своему loop, поэтому переиспользовать его через asyncio.run нельзя
+# -----------------------------
+class Transport:
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="appstore-transport", daemon=True)
+        self._thread.start()
+        self._clients: dict[tuple[int, bool], httpx.AsyncClient] = {}
+        self._lock = threading.Lock()
+
+    def client(self, pool_size: int, http2: bool = True) -> httpx.AsyncClient:
+        # пул соединений под заданную параллельность; на каждый размер — свой клиент,
+        # чтобы смена настройки в одной сессии не рвала соединения другой
+        key = (max(1, int(pool_size)), http2 and HTTP2_AVAILABLE)
+        with self._lock:
+            c = self._clients.get(key)
+            if c is None:
+                c = self._clients[key] = asyncio.run_coroutine_threadsafe(_make_client(*key), self.loop).result()
+            return c
+
+    def submit(self, make_coro, cancel_token: "CancelToken | None" = None) -> "ScrapeHandle":
+        # корутина исполняется в потоке транспорта и не зависит от жизни вызвавшего скрипта
+        handle = ScrapeHandle(cancel_token or CancelToken())
+        handle.future = asyncio.run_coroutine_threadsafe(make_coro(handle.report), self.loop)
+        return handle
+
+    def run(self, make_coro, progress_callback=None, cancel_token: "CancelToken | None" = None):
+        # блокирующий вариант: прерывание вызывающего потока отменяет и корутину
+        handle = self.submit(make_coro, cancel_token)
+        try:
+            return handle.wait(progress_callback)
+        except BaseException:
+            handle.future.cancel()
+            raise
+
+class ScrapeCancelled(Exception):
+    pass
+
+class CancelToken:
+    # флаг отмены, который ставят из потока UI, а ждут корутины в цикле транспорта
+    def __init__(self):
+        self._flag = threading.Event()
+        self._events: dict[asyncio.AbstractEventLoop, asyncio.Event] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._flag.is_set()
+
+    def cancel(self):
+        with self._lock:
+            self._flag.set()
+            events = list(self._events.items())
+        for loop, event in events:
+            loop.call_soon_threadsafe(event.set)
+
+    async def wait(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            event = self._events.get(loop)
+            if event is None:
+                event = self._events[loop] = asyncio.Event()
+                if self._flag.is_set():
+                    event.set()
+        await event.wait()
+
+    async def sleep(self, seconds: float) -> bool:
+        # True — проспали целиком, False — разбудила отмена
+        if self.cancelled:
+            return False
+        waiter = asyncio.ensure_future(self.wait())
+        try:
+            done, _ = await asyncio.wait({waiter}, timeout=seconds)
+        finally:
+            waiter.cancel()
+        return not done
+
+class ScrapeHandle:
+    # запущенный сбор: future в цикле транспорта, последний прогресс и токен отмены.
+    # Переживает перезапуск скрипта Streamlit — новый прогон скрипта может подхватить его снова
+    def __init__(self, cancel_token: CancelToken):
+        self.cancel_token = cancel_token
+        self.future: concurrent.futures.Future | None = None
+        self.progress: tuple | None = None
+        self._delivered: tuple | None = None
+
+    def report(self, *args):
+        self.progress = args
+
+    def cancel(self):
+        self.cancel_token.cancel()
+
+    def done(self) -> bool:
+        return self.future.done()
+
+    def wait(self, progress_callback=None, timeout: float | None = None):
+        # прогресс отдаётся в вызывающий поток (Streamlit-элементы можно трогать только из потока
+        # скрипта) не чаще раза в 0.1 с; по timeout — concurrent.futures.TimeoutError
+        started = time.monotonic()
+        while True:
+            try:
+                result = self.future.result(timeout=0.1)
+            except concurrent.futures.TimeoutError:
+                self._deliver(progress_callback)
+                if timeout is not None and time.monotonic() - started >= timeout:
+                    raise
+                continue
+            self._deliver(progress_callback)
+            return result
+
+    def _deliver(self, progress_callback):
+        args = self.progress
+        if progress_callback and args is not None and args is not self._delivered:
+            self._delivered = args
+            progress_callback(*args)
+
+async def _make_client(pool_size: int, http2: bool) -> httpx.AsyncClient:
+    limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size, keepalive_expiry=60)
+    return httpx.AsyncClient(headers=DEFAULT_HEADERS, limits=limits, http2=http2, follow_redirects=True)
+
+@st.cache_resource
+def get_transport() -> Transport:
+    # один транспорт на процесс: переживает перезапуски скрипта и общий для всех сессий
+    return Transport()
+
+
+# -----------------------------
+# Запись и воспроизведение трафика: gzip-JSONL архив ответов (тело как пришло по сети + задержка)
+# -----------------------------
+class TrafficArchive:
+    def __init__(self, path: str, recorded_at: datetime | None = None):
+        self.path = path
+        self.recorded_at = recorded_at
+        self.records: dict[tuple[str, str], list[dict]] = {}
+        self.served = 0
+        self.misses = 0
+        self._fh = None
+
+    @classmethod
+    def create(cls, path: str) -> "TrafficArchive":
+        archive = cls(path, recorded_at=datetime.now(timezone.utc))
+        archive._fh = gzip.open(path, "wt", encoding="utf-8")
+        archive._write({"kind": "meta", "recorded_at": archive.recorded_at.isoformat()})
+        return archive
+
+    @classmethod
+    def load(cls, path: str) -> "TrafficArchive":
+        archive = cls(path)
+        with gzip.open(path, "rt", encoding="utf-8") as fh:
+            for line in fh:
+                rec = json.loads(line)
+                if rec.get("kind") == "meta":
+                    archive.recorded_at = parse_iso_date(rec.get("recorded_at"))
+                    continue
+                archive.records.setdefault((rec["method"], rec["url"]), []).append(rec)
+        return archive
+
+    def _write(self, rec: dict):
+        self._fh.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        self._fh.flush()
+
+    def add(self, request: httpx.Request, status: int, headers: httpx.Headers, body: bytes, latency: float):
+        self._write({
+            "kind": "response",
+            "method": request.method,
+            "url": str(request.url),
+            "params": dict(request.url.params),
+            "status": status,
+            "headers": headers.multi_items(),
+            "body": base64.b64encode(body).decode("ascii"),
+            "latency": round(latency, 4),
+        })
+
+    def next_for(self, request: httpx.Request) -> dict | None:
+        # повторы одного URL (ретраи, страницы) отдаются в записанном порядке, последний — по кругу
+        queue = self.records.get((request.method, str(request.url)))
+        if not queue:
+            return None
+        return queue.pop(0) if len(queue) > 1 else queue[0]
+
+    def close(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    def __init__(self, inner: httpx.AsyncBaseTransport, archive: TrafficArchive):
+        self.inner = inner
+        self.archive = archive
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        response = await self.inner.handle_async_request(request)
+        headers = response.headers
+        try:
+            # сырое тело (до распаковки gzip/br) — архив компактнее, а клиент распакует как обычно
+            body = b"".join([chunk async for chunk in response.aiter_raw()])
+        except httpx.StreamConsumed:
+            # транспорт уже прочитал и распаковал тело сам — сохраняем распакованным
+            body = response.content
+            headers = httpx.Headers([(k, v) for k, v in headers.multi_items() if k.lower() != "content-encoding"])
+        finally:
+            await response.aclose()
+        self.archive.add(request, response.status_code, headers, body, time.perf_counter() - started)
+        return httpx.Response(response.status_code, headers=headers, content=body, extensions=response.extensions)
+
+    async def aclose(self):
+        await self.inner.aclose()
+        self.archive.close()
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    def __init__(self, archive: TrafficArchive, reproduce_latency: bool = False):
+        self.archive = archive
+        self.reproduce_latency = reproduce_latency
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        rec = self.archive.next_for(request)
+        if rec is None:
+            self.archive.misses += 1
+            return httpx.Response(404, headers={"X-Replay-Miss": "1"}, request=request)
+        self.archive.served += 1
+        if self.reproduce_latency:
+            await asyncio.sleep(rec["latency"])
+        return httpx.Response(
+            rec["status"], headers=rec["headers"], content=base64.b64decode(rec["body"]), request=request,
+        )
+
+@asynccontextmanager
+async def _traffic_client(
+    pooled: httpx.AsyncClient,
+    pool_size: int,
+    http2: bool,
+    record_to: str | None = None,
+    replay_from: TrafficArchive | None = None,
+    replay_latency: bool = False,
+):
+    # обычный прогон идёт через общий клиент транспорта; запись и воспроизведение — через свой
+    if not record_to and replay_from is None:
+        yield pooled
+        return
+
+    if replay_from is not None:
+        inner = ReplayTransport(replay_from, reproduce_latency=replay_latency)
+    else:
+        limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        network = httpx.AsyncHTTPTransport(http2=http2 and HTTP2_AVAILABLE, limits=limits)
+        inner = RecordingTransport(network, TrafficArchive.create(record_to))
+    async with httpx.AsyncClient(headers=DEFAULT_HEADERS, transport=inner, follow_redirects=True) as client:
+        yield client
+
+
+# -----------------------------
+# Локальное состояние между прогонами (SQLite-файл рядом с приложением)
+# -----------------------------
+STATE_DB_PATH = os.environ.get("APPSTORE_STATE_DB", ".appstore_state.sqlite3")
+
+def open_state_db(path: str | None = None) -> sqlite3.Connection:
+    conn = sqlite3.connect(path or STATE_DB_PATH, timeout=10, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+# -----------------------------
+# Общий для всех процессов на машине token bucket (в том же SQLite-файле):
+# сессии Streamlit и cron-задачи вместе не превышают лимит запросов с одного IP
+# -----------------------------
+SHARED_RATE_LIMIT = float(os.environ.get("APPSTORE_SHARED_RATE", "20"))
+SHARED_RATE_BURST = float(os.environ.get("APPSTORE_SHARED_BURST", "10"))
+
+class SharedRateLimiter:
+    def __init__(self, rate: float, burst: float = SHARED_RATE_BURST, path: str | None = None, name: str = "egress"):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.name = name
+        # своё соединение: запросы к нему идут из пула потоков, не из цикла событий
+        self.conn = sqlite3.connect(path or STATE_DB_PATH, timeout=10, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_buckets (name TEXT PRIMARY KEY, tokens REAL, updated_at REAL)"
+            )
+
+    def _reserve(self) -> float:
+        # токен берётся сразу (баланс может уйти в минус), в ответ — сколько ждать своей очереди.
+        # BEGIN IMMEDIATE сериализует пополнение и списание между процессами
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = self.conn.execute(
+                    "SELECT tokens, updated_at FROM rate_buckets WHERE name = ?", (self.name,),
+                ).fetchone()
+                tokens = self.burst if row is None else min(self.burst, row[0] + max(0.0, now - row[1]) * self.rate)
+                tokens -= 1.0
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO rate_buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                    (self.name, tokens, now),
+                )
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        return max(0.0, -tokens / self.rate)
+
+    async def reserve(self) -> float:
+        # сколько ждать своей очереди (ждёт вызывающий — так ожидание можно прервать)
+        return await asyncio.to_thread(self._reserve)
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+async def _single_flight(inflight: dict, key, factory):
+    # одновременные вызовы с одним ключом ждут один и тот же запрос
+    fut = inflight.get(key)
+    if fut is not None:
+        return await asyncio.shield(fut)
+
+    fut = asyncio.get_running_loop().create_future()
+    inflight[key] = fut
+    try:
+        result = await factory()
+    except asyncio.CancelledError:
+        fut.cancel()
+        raise
+    except Exception as e:
+        fut.set_exception(e)
+        fut.exception()
+        raise
+    else:
+        fut.set_result(result)
+        return result
+    finally:
+        inflight.pop(key, None)
+
+
+# -----------------------------
+# HTTP-кэш на диске: тело + ETag/Last-Modified, свои сроки для RSS и lookup
+# -----------------------------
+@dataclass
+class CachePolicy:
+    fresh_for: float  # столько секунд ответ отдаётся без сети
+    keep_for: float   # столько секунд хранится для условного запроса (304)
+
+HTTP_CACHE_POLICIES = {
+    "rss": CachePolicy(fresh_for=5 * 60, keep_for=7 * 24 * 3600),
+    "lookup": CachePolicy(fresh_for=6 * 3600, keep_for=7 * 24 * 3600),
+}
+
+def http_cache_key(url: str, params: dict | None) -> str:
+    return f"{url}?{urlencode(sorted((params or {}).items()))}" if params else url
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    content_type: str | None
+    etag: str | None
+    last_modified: str | None
+    is_fresh: bool
+
+    def validators(self) -> dict:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def to_response(self, url: str, params: dict | None) -> httpx.Response:
+        headers = {"Content-Type": self.content_type} if self.content_type else {}
+        return httpx.Response(200, headers=headers, content=self.body, request=httpx.Request("GET", url, params=params))
+
+class HttpCache:
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS http_cache ("
+                "key TEXT PRIMARY KEY, body BLOB, content_type TEXT, etag TEXT, last_modified TEXT, stored_at REAL)"
+            )
+            max_keep = max(p.keep_for for p in HTTP_CACHE_POLICIES.values())
+            conn.execute("DELETE FROM http_cache WHERE stored_at < ?", (time.time() - max_keep,))
+
+    def get(self, key: str, policy: CachePolicy) -> CachedResponse | None:
+        row = self.conn.execute(
+            "SELECT body, content_type, etag, last_modified, stored_at FROM http_cache WHERE key = ?",
+            (key,),
+        ).fetchone()
+        if not row:
+            return None
+        age = time.time() - row[4]
+        if age > policy.keep_for:
+            return None
+        # без валидаторов просроченная запись бесполезна: условный запрос не сделать
+        if age > policy.fresh_for and not (row[2] or row[3]):
+            return None
+        return CachedResponse(zlib.decompress(row[0]), row[1], row[2], row[3], is_fresh=age <= policy.fresh_for)
+
+    def put(self, key: str, r: httpx.Response):
+        # тело хранится уже распакованным (и пережатым zlib), поэтому Content-Encoding не сохраняем
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO http_cache (key, body, content_type, etag, last_modified, stored_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    key, zlib.compress(r.content), r.headers.get("Content-Type"),
+                    r.headers.get("ETag"), r.headers.get("Last-Modified"), time.time(),
+                ),
+            )
+
+    def touch(self, key: str):
+        with self.conn:
+            self.conn.execute("UPDATE http_cache SET stored_at = ? WHERE key = ?", (time.time(), key))
+
+
 # -----------------------------
 # Извлечение app_id и дефолтной страны из URL
 # -----------------------------
@@ -102,32 +1177,167 @@ def extract_default_country_from_url(app_url: str) -> str:
 # -----------------------------
 # iTunes Lookup: проверка доступности приложения в стране + app_name
 # -----------------------------
-def itunes_lookup(session: requests.Session, app_id: str, country: str) -> dict | None:
-    url = "https://itunes.apple.com/lookup"
-    r = request_with_retry(session, url, params={"id": app_id, "country": country})
+# ITUNES_BASE_URL позволяет направить сбор на локальный mock_appstore.py
+ITUNES_BASE_URL = os.environ.get("ITUNES_BASE_URL", "https://itunes.apple.com").rstrip("/")
+ITUNES_LOOKUP_URL = f"{ITUNES_BASE_URL}/lookup"
+
+class LookupCache:
+    # (app_id, country) -> ответ lookup; "нет в стране" хранится дольше, чем метаданные
+    def __init__(self, conn: sqlite3.Connection, positive_ttl: float = 6 * 3600, negative_ttl: float = 3 * 24 * 3600):
+        self.conn = conn
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.inflight: dict[tuple[str, str], asyncio.Future] = {}
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS lookup_cache ("
+                "app_id TEXT, country TEXT, payload TEXT, stored_at REAL, "
+                "PRIMARY KEY (app_id, country))"
+            )
+
+    def get(self, app_id: str, country: str) -> tuple[bool, dict | None]:
+        row = self.conn.execute(
+            "SELECT payload, stored_at FROM lookup_cache WHERE app_id = ? AND country = ?",
+            (app_id, country),
+        ).fetchone()
+        if not row:
+            return False, None
+        payload = json.loads(row[0]) if row[0] else None
+        ttl = self.positive_ttl if payload else self.negative_ttl
+        if time.time() - row[1] > ttl:
+            return False, None
+        return True, payload
+
+    def put(self, app_id: str, country: str, payload: dict | None):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO lookup_cache (app_id, country, payload, stored_at) VALUES (?, ?, ?, ?)",
+                (app_id, country, json.dumps(payload, ensure_ascii=False) if payload else None, time.time()),
+            )
+
+async def _lookup_request(ctx: FetchContext, app_id: str, country: str) -> tuple[bool, dict | None]:
+    # (окончательный ли ответ, данные): сетевой сбой не должен попасть в кэш как "нет в стране"
+    url = ITUNES_LOOKUP_URL
+    r = await request_with_retry(
+        ctx, url, params={"id": app_id, "country": country},
+        breaker_key=(country, "lookup"), cache_policy="lookup",
+    )
     if not r:
-        return None
+        return False, None
     try:
         data = r.json()
     except Exception:
-        return None
+        return False, None
     if data.get("resultCount", 0) < 1:
-        return None
-    return data
+        return True, None
+    return True, data
+
+async def itunes_lookup(ctx: FetchContext, app_id: str, country: str) -> tuple[bool, dict | None]:
+    # (окончательный ли ответ, данные) — как у _lookup_request; None без final — не "нет в стране"
+    cache = ctx.lookup_cache
+    if cache is None:
+        return await _lookup_request(ctx, app_id, country)
+
+    hit, data = cache.get(app_id, country)
+    if hit:
+        ctx.stats.lookup_cache_hits += 1
+        return True, data
 
-def get_app_name(session: requests.Session, app_id: str, preferred_country: str) -> str | None:
+    async def fetch():
+        final, data = await _lookup_request(ctx, app_id, country)
+        if final:
+            cache.put(app_id, country, data)
+        return final, data
+
+    return await _single_flight(cache.inflight, (app_id, country), fetch)
+
+async def get_app_name(ctx: FetchContext, app_id: str, preferred_country: str) -> str | None:
     for c in [preferred_country, "us"]:
-        data = itunes_lookup(session, app_id, c)
+        _, data = await itunes_lookup(ctx, app_id, c)
         if data and data.get("results"):
             return data["results"][0].get("trackName")
     return None
 
 
+# -----------------------------
+# Пакетный lookup: много app_id одним запросом на страну -> матрица доступности
+# -----------------------------
+BULK_LOOKUP_CHUNK = 100
+
+async def itunes_lookup_bulk(ctx: FetchContext, app_ids: list[str], country: str) -> dict[str, dict | None]:
+    # {app_id: данные lookup или None}; app_id без ответа (сбой сети) в результат не попадают.
+    # Ответы раскладываются в кэш по одному app_id, так что обычный itunes_lookup их увидит
+    cache = ctx.lookup_cache
+    out: dict[str, dict | None] = {}
+    pending = []
+    for app_id in app_ids:
+        if cache is not None:
+            hit, data = cache.get(app_id, country)
+            if hit:
+                ctx.stats.lookup_cache_hits += 1
+                out[app_id] = data
+                continue
+        pending.append(app_id)
+
+    url = ITUNES_LOOKUP_URL
+    for i in range(0, len(pending), BULK_LOOKUP_CHUNK):
+        chunk = pending[i:i + BULK_LOOKUP_CHUNK]
+        r = await request_with_retry(
+            ctx, url, params={"id": ",".join(chunk), "country": country},
+            breaker_key=(country, "lookup"), cache_policy="lookup",
+        )
+        if not r:
+            continue
+        try:
+            data = r.json()
+        except Exception:
+            continue
+
+        by_id = {str(item.get("trackId")): item for item in data.get("results", [])}
+        for app_id in chunk:
+            item = by_id.get(app_id)
+            payload = {"resultCount": 1, "results": [item]} if item else None
+            out[app_id] = payload
+            if cache is not None:
+                cache.put(app_id, country, payload)
+
+    return out
+
+async def lookup_availability_matrix(
+    ctx: FetchContext,
+    app_ids: list[str],
+    countries: list[str] | None = None,
+) -> pd.DataFrame:
+    # app_id x страна: True/False, <NA> — страну не удалось проверить
+    countries = countries or STORE_FRONTS
+    results = await asyncio.gather(*(itunes_lookup_bulk(ctx, app_ids, c) for c in countries))
+
+    matrix = pd.DataFrame(index=pd.Index(app_ids, name="app_id"), columns=countries, dtype="boolean")
+    for country, found in zip(countries, results):
+        for app_id, data in found.items():
+            matrix.loc[app_id, country] = data is not None
+    return matrix
+
+
 # -----------------------------
 # Apple RSS JSON endpoint: customerreviews
 # -----------------------------
+RSS_PAGE_SIZE = 50
+RSS_MAX_PAGES = 10
+
 def build_rss_url(country: str, app_id: str, page: int) -> str:
-    return f"https://itunes.apple.com/{country}/rss/customerreviews/page={page}/id={app_id}/sortby=mostrecent/json"
+    return f"{ITUNES_BASE_URL}/{country}/rss/customerreviews/page={page}/id={app_id}/sortby=mostrecent/json"
+
+def parse_rss_app_name(feed_json: dict) -> str | None:
+    # первая запись первой страницы RSS — карточка приложения с im:name
+    entries = ((feed_json or {}).get("feed") or {}).get("entry", [])
+    if isinstance(entries, dict):
+        entries = [entries]
+    for e in entries:
+        name = ((e.get("im:name") or {}).get("label"))
+        if name:
+            return name
+    return None
 
 def parse_rss_reviews(feed_json: dict) -> list[dict]:
     feed = (feed_json or {}).get("feed", {})
@@ -322,129 +1532,816 @@ def tag_topics(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
+# -----------------------------
+# Инкрементальный сбор: high-water mark (самый свежий review_id + дата) на (app_id, страна)
+# -----------------------------
+class HighWaterMarks:
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS high_water_marks ("
+                "app_id TEXT, country TEXT, review_id TEXT, review_date TEXT, updated_at REAL, "
+                "PRIMARY KEY (app_id, country))"
+            )
+
+    def get(self, app_id: str, country: str) -> tuple[str | None, datetime] | None:
+        row = self.conn.execute(
+            "SELECT review_id, review_date FROM high_water_marks WHERE app_id = ? AND country = ?",
+            (app_id, country),
+        ).fetchone()
+        if not row:
+            return None
+        dt = parse_iso_date(row[1])
+        return (row[0], dt) if dt else None
+
+    def put(self, app_id: str, country: str, review_id: str | None, review_date: datetime):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO high_water_marks (app_id, country, review_id, review_date, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (app_id, country, review_id, review_date.isoformat(), time.time()),
+            )
+
+
+# -----------------------------
+# Доходность витрин: сколько RU-отзывов приносит запрос (по приложению), с затуханием
+# -----------------------------
+YIELD_DECAY = 0.7
+YIELD_RECHECK_AFTER = 7 * 24 * 3600
+
+@dataclass
+class StorefrontYield:
+    requests: float = 0.0
+    scanned: float = 0.0
+    kept: float = 0.0
+    runs: int = 0
+    zero_runs: int = 0
+    updated_at: float = 0.0
+
+    @property
+    def per_request(self) -> float:
+        return self.kept / self.requests if self.requests else 0.0
+
+class YieldStats:
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS storefront_yield ("
+                "app_id TEXT, country TEXT, requests REAL, scanned REAL, kept REAL, "
+                "runs INTEGER, zero_runs INTEGER, updated_at REAL, "
+                "PRIMARY KEY (app_id, country))"
+            )
+
+    def load(self, app_id: str) -> dict[str, StorefrontYield]:
+        rows = self.conn.execute(
+            "SELECT country, requests, scanned, kept, runs, zero_runs, updated_at "
+            "FROM storefront_yield WHERE app_id = ?",
+            (app_id,),
+        ).fetchall()
+        return {r[0]: StorefrontYield(*r[1:]) for r in rows}
+
+    def update(self, app_id: str, country: str, requests: int, scanned: int, kept: int, caught_up: bool):
+        prev = self.load_one(app_id, country) or StorefrontYield()
+        # caught_up: инкрементальный прогон просто не нашёл нового — это не "пустая" витрина
+        if kept:
+            zero_runs = 0
+        elif caught_up:
+            zero_runs = prev.zero_runs
+        else:
+            zero_runs = prev.zero_runs + 1
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO storefront_yield "
+                "(app_id, country, requests, scanned, kept, runs, zero_runs, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    app_id, country,
+                    prev.requests * YIELD_DECAY + requests,
+                    prev.scanned * YIELD_DECAY + scanned,
+                    prev.kept * YIELD_DECAY + kept,
+                    prev.runs + 1, zero_runs, time.time(),
+                ),
+            )
+
+    def load_one(self, app_id: str, country: str) -> StorefrontYield | None:
+        row = self.conn.execute(
+            "SELECT requests, scanned, kept, runs, zero_runs, updated_at "
+            "FROM storefront_yield WHERE app_id = ? AND country = ?",
+            (app_id, country),
+        ).fetchone()
+        return StorefrontYield(*row) if row else None
+
+def plan_countries_by_yield(
+    countries: list[str],
+    yields: dict[str, StorefrontYield],
+    skip_zero_yield_runs: int | None = None,
+) -> tuple[list[str], dict[str, str]]:
+    # сначала витрины с доходностью > 0 (по убыванию), потом без истории, в конце нулевые;
+    # внутри группы сохраняется исходный порядок
+    now = time.time()
+    skipped = {}
+    productive, unknown, zero = [], [], []
+    for c in countries:
+        y = yields.get(c)
+        if y is None or not y.runs:
+            unknown.append(c)
+            continue
+        if (
+            skip_zero_yield_runs
+            and y.zero_runs >= skip_zero_yield_runs
+            and now - y.updated_at < YIELD_RECHECK_AFTER
+        ):
+            skipped[c] = f"0 RU-отзывов {y.zero_runs} запусков подряд"
+            continue
+        (productive if y.per_request > 0 else zero).append(c)
+
+    productive.sort(key=lambda c: yields[c].per_request, reverse=True)
+    return productive + unknown + zero, skipped
+
+def expected_request_value(countries: list[str], yields: dict[str, StorefrontYield]) -> dict[str, float]:
+    # ожидаемые RU-отзывы на запрос; витрине без истории — средняя по известным
+    known = [yields[c].per_request for c in countries if c in yields and yields[c].runs]
+    prior = sum(known) / len(known) if known else 0.0
+    return {c: yields[c].per_request if c in yields and yields[c].runs else prior for c in countries}
+
+
+# -----------------------------
+# Ранняя остановка витрины: доля RU среди отзывов ~ Beta(a, b) (априорно — из истории витрины),
+# шанс, что в следующих m отзывах будет хоть один RU: 1 - B(a, b + m) / B(a, b)
+# -----------------------------
+EARLY_STOP_PRIOR = (0.5, 0.5)          # без истории — Джеффрис
+EARLY_STOP_PRIOR_STRENGTH = 100.0      # история весит не больше стольких отзывов
+
+def _log_beta(a: float, b: float) -> float:
+    return math.lgamma(a) + math.lgamma(b) - math.lgamma(a + b)
+
+def ru_rate_prior(y: StorefrontYield | None) -> tuple[float, float]:
+    a, b = EARLY_STOP_PRIOR
+    if y is None or y.scanned <= 0:
+        return a, b
+    scale = min(1.0, EARLY_STOP_PRIOR_STRENGTH / y.scanned)
+    return a + y.kept * scale, b + max(0.0, y.scanned - y.kept) * scale
+
+def chance_of_keepable(a: float, b: float, kept: int, scanned: int, m: int) -> float:
+    a, b = a + kept, b + scanned - kept
+    return 1.0 - math.exp(_log_beta(a, b + m) - _log_beta(a, b))
+
+
 # -----------------------------
 # Основная логика сбора
 # -----------------------------
-def scrape_appstore_reviews_all_countries(
-    app_url: str,
-    per_country_limit: int = 50,
-    days: int = 7,
-    ru_threshold: float = 0.55,
-    delay_between_requests_min: float = 0.25,
-    delay_between_requests_max: float = 0.55,
-    progress_callback=None,
-):
-    app_id = extract_app_id(app_url)
-    default_country = extract_default_country_from_url(app_url)
+BASE_COLS = [
+    "app_id","app_name","country","review_id","author_name","rating",
+    "title","review_text","review_date","version","language","source_url"
+]
 
-    session = requests.Session()
-    session.headers.update({
-        "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome Safari",
-        "Accept": "application/json,text/plain,*/*",
-    })
+FINAL_COLS = [
+    "app_id","app_name","country","review_id","author_name","rating",
+    "title","review_text","review_date","version","language",
+    "topic_tags","topic_onboarding","topic_streak","topic_ads",
+    "topic_subscription","topic_bugs","topic_motivation",
+    "source_url",
+]
 
-    app_name = get_app_name(session, app_id, preferred_country=default_country)
-    now_utc = datetime.now(timezone.utc)
-    cutoff = now_utc - relativedelta(days=days)
+@dataclass
+class _Sweep:
+    # общие параметры прогона + дедуп-множества, разделяемые всеми странами
+    app_id: str
+    app_name: str | None
+    app_url: str
+    cutoff: datetime
+    per_country_limit: int
+    ru_threshold: float
+    probe_rss: bool = False
+    deep_history: bool = False
+    marks: HighWaterMarks | None = None
+    yields: YieldStats | None = None
+    allocator: "RequestAllocator | None" = None
+    checkpoint: "SweepCheckpoint | None" = None
+    progress: "ProgressTracker | None" = None
+    # ранняя остановка: порог шанса найти RU на следующей странице + история витрин для априорной оценки
+    early_stop: float | None = None
+    history: dict[str, StorefrontYield] = field(default_factory=dict)
+    seen_review_ids: set = field(default_factory=set)
+    seen_fallback: set = field(default_factory=set)
+
+@dataclass
+class _CountryScan:
+    country: str
+    pages: int = 0
+    scanned: int = 0
+    stop_due_to_old: bool = False
+    # лента кончилась (пустая страница или последняя страница RSS)
+    exhausted: bool = False
+    # инкрементальный режим: сбор оборвали лимит или ранняя остановка раньше прошлой отметки — отметку не двигали
+    mark_held: bool = False
+    failed: bool = False
+    done: bool = False
+    # инкрементальный режим: отметка прошлого прогона и самый свежий отзыв этого
+    known: tuple[str | None, datetime] | None = None
+    reached_known: bool = False
+    newest: tuple[str | None, datetime] | None = None
+    rows: list = field(default_factory=list)
+    # сколько страниц витрине, по прикидке, ещё нужно (для распределения бюджета запросов)
+    planned_pages: int = 1
 
-    all_rows = []
-    seen_review_ids = set()
-    seen_fallback = set()
 
-    countries = [default_country] + [c for c in STORE_FRONTS if c != default_country]
-    total_countries = len(countries)
+# -----------------------------
+# Ход прогона: сделанные и запланированные запросы (без повторов), темп и оценка остатка
+# -----------------------------
+PROGRESS_MIN_INTERVAL = 0.25
+PROGRESS_EWMA_ALPHA = 0.3
+
+@dataclass(frozen=True)
+class ScrapeProgress:
+    requests_done: int
+    requests_planned: int
+    countries_done: int
+    countries_total: int
+    pages: int
+    scanned: int
+    kept: int
+    retries: int
+    # темп отправки (AIMD) и фактическая пропускная способность в запросах плана в секунду
+    rate: float
+    throughput: float
+    eta_s: float | None
+    country: str | None = None
+
+    @property
+    def fraction(self) -> float:
+        if not self.requests_planned:
+            return 0.0
+        return min(1.0, self.requests_done / self.requests_planned)
+
+class ProgressTracker:
+    # единица работы — запрос плана: проверка доступности витрины и каждая страница ленты.
+    # Пока витрина не начата, на неё закладывается prior_pages страниц; после первой страницы —
+    # её planned_pages. Повторы в план не входят, они видны отдельным счётчиком
+    def __init__(self, ctx: FetchContext, scans: list[_CountryScan], prior_pages: int, callback):
+        self.ctx = ctx
+        self.scans = scans
+        self.prior_pages = prior_pages
+        self.callback = callback
+        self.throughput: float | None = None
+        self._last_at: float | None = None
+        self._last_done = 0
+        self._last_emit = 0.0
+
+    def _work(self, scan: _CountryScan) -> tuple[int, int]:
+        # (сделано, запланировано) по витрине; проверка доступности — первая единица
+        if scan.done:
+            n = max(1, scan.pages)
+            return n, n
+        if not scan.pages:
+            return 0, 1 + self.prior_pages
+        return scan.pages, max(scan.pages + 1, scan.planned_pages)
+
+    def snapshot(self, country: str | None = None) -> ScrapeProgress:
+        done = planned = 0
+        for scan in self.scans:
+            d, p = self._work(scan)
+            done += d
+            planned += p
+
+        now = time.monotonic()
+        if self._last_at is None:
+            self._last_at, self._last_done = now, done
+        elif now > self._last_at and done > self._last_done:
+            sample = (done - self._last_done) / (now - self._last_at)
+            self.throughput = sample if self.throughput is None else (
+                PROGRESS_EWMA_ALPHA * sample + (1 - PROGRESS_EWMA_ALPHA) * self.throughput
+            )
+            self._last_at, self._last_done = now, done
+
+        eta = None
+        if self.throughput:
+            eta = (planned - done) / self.throughput
+            # дальше дедлайна прогон не пойдёт
+            if self.ctx.deadline_at is not None:
+                eta = min(eta, max(0.0, self.ctx.deadline_at - asyncio.get_running_loop().time()))
+
+        return ScrapeProgress(
+            requests_done=done,
+            requests_planned=planned,
+            countries_done=sum(1 for s in self.scans if s.done),
+            countries_total=len(self.scans),
+            pages=sum(s.pages for s in self.scans),
+            scanned=sum(s.scanned for s in self.scans),
+            kept=sum(len(s.rows) for s in self.scans),
+            retries=self.ctx.stats.retries,
+            rate=self.ctx.rate.rate,
+            throughput=self.throughput or 0.0,
+            eta_s=eta,
+            country=country,
+        )
 
-    for idx, country in enumerate(countries):
-        if progress_callback:
-            progress_callback((idx + 1) / total_countries, country)
+    def tick(self, country: str | None = None, force: bool = False):
+        # не чаще раза в PROGRESS_MIN_INTERVAL: прогресс-бар не должен перерисовываться на каждую страницу
+        now = time.monotonic()
+        if not force and now - self._last_emit < PROGRESS_MIN_INTERVAL:
+            return
+        self._last_emit = now
+        self.callback(self.snapshot(country))
 
-        lookup = itunes_lookup(session, app_id, country)
-        if not lookup:
-            continue
 
-        scanned = 0
-        stop_due_to_old = False
-        page = 1
+# -----------------------------
+# Бюджет запросов на прогон: очередной запрос получает витрина, если бюджета хватает
+# и после резерва под всех, кто по текущей оценке доходнее. Оценка — RU-отзывы на страницу:
+# история (априорно) + то, что витрина уже дала в этом прогоне
+# -----------------------------
+ALLOCATOR_PRIOR_WEIGHT = 2.0
+
+class RequestAllocator:
+    def __init__(self, max_requests: int, stats: RunStats, priors: dict[str, float], priorities: dict[str, float]):
+        self.max_requests = max_requests
+        self.stats = stats
+        self.priors = priors
+        self.priorities = priorities
+        self.scans: dict[str, _CountryScan] = {}
+        self.rank: dict[str, int] = {}
+        self.in_flight = 0
+        self._changed = asyncio.Event()
+
+    def register(self, scans: list[_CountryScan], pages: int):
+        for i, scan in enumerate(scans):
+            if not scan.pages:
+                scan.planned_pages = pages
+            self.scans[scan.country] = scan
+            self.rank[scan.country] = i
+
+    def remaining(self) -> int:
+        # выданные, но ещё не отправленные запросы тоже занимают бюджет
+        return self.max_requests - self.stats.requests - self.in_flight
+
+    def value(self, scan: _CountryScan) -> float:
+        prior = self.priors.get(scan.country, 0.0)
+        return (prior * ALLOCATOR_PRIOR_WEIGHT + len(scan.rows)) / (ALLOCATOR_PRIOR_WEIGHT + scan.pages)
+
+    def _key(self, scan: _CountryScan) -> tuple[float, int]:
+        # при равной оценке — порядок плана
+        return self.value(scan), -self.rank.get(scan.country, 0)
+
+    def _reserved_above(self, scan: _CountryScan) -> int:
+        mine = self._key(scan)
+        return sum(
+            max(1, s.planned_pages - s.pages)
+            for s in self.scans.values()
+            if s is not scan and not s.done and self._key(s) > mine
+        )
+
+    async def acquire(self, scan: _CountryScan) -> bool:
+        # самая ценная из ждущих витрин проходит всегда (резерв над ней пуст), остальные
+        # ждут, пока кто-то закончит запрос или витрину; без бюджета — отказ
+        while True:
+            if self.remaining() <= 0:
+                self.stats.budget_denied += 1
+                return False
+            if self.remaining() - self._reserved_above(scan) > 0:
+                self.in_flight += 1
+                return True
+            changed = self._changed
+            await changed.wait()
+
+    def release(self, scan: _CountryScan):
+        self.in_flight -= 1
+        self.priorities[scan.country] = self.value(scan)
+        self.notify()
+
+    def notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+async def _budgeted(sweep: _Sweep, scan: _CountryScan, make_request) -> tuple[bool, object]:
+    # (выдан ли запрос бюджетом, результат)
+    if sweep.allocator is None:
+        return True, await make_request()
+    if not await sweep.allocator.acquire(scan):
+        return False, None
+    try:
+        return True, await make_request()
+    finally:
+        sweep.allocator.release(scan)
+
+# -----------------------------
+# Чекпоинт прогона: готовые витрины, позиция в недоделанных, дедуп-множества и собранные строки.
+# Ключ — параметры прогона: прерванный прогон с теми же параметрами продолжается с места остановки
+# -----------------------------
+CHECKPOINT_INTERVAL = 2.0
+CHECKPOINT_MAX_AGE = 24 * 3600
+
+def checkpoint_key(**params) -> str:
+    return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:32]
+
+def _mark_to_json(mark: tuple[str | None, datetime] | None):
+    return [mark[0], mark[1].isoformat()] if mark else None
+
+def _mark_from_json(value) -> tuple[str | None, datetime] | None:
+    return (value[0], parse_iso_date(value[1])) if value else None
+
+class SweepCheckpoint:
+    def __init__(self, conn: sqlite3.Connection, key: str):
+        self.conn = conn
+        self.key = key
+        self.sweep: _Sweep | None = None
+        self.scans: list[_CountryScan] = []
+        self.skipped: dict[str, str] = {}
+        self._saved_at = float("-inf")
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sweep_checkpoints (key TEXT PRIMARY KEY, payload BLOB, updated_at REAL)"
+            )
+            conn.execute("DELETE FROM sweep_checkpoints WHERE updated_at < ?", (time.time() - CHECKPOINT_MAX_AGE,))
+
+    def load(self) -> dict | None:
+        row = self.conn.execute("SELECT payload FROM sweep_checkpoints WHERE key = ?", (self.key,)).fetchone()
+        return json.loads(zlib.decompress(row[0])) if row else None
+
+    def attach(self, sweep: _Sweep, scans: list[_CountryScan], skipped: dict[str, str]):
+        self.sweep, self.scans, self.skipped = sweep, scans, skipped
+
+    def save(self, force: bool = False):
+        # снимок целиком синхронный (без await), поэтому строки и дедуп-множества согласованы
+        now = time.monotonic()
+        if self.sweep is None or (not force and now - self._saved_at < CHECKPOINT_INTERVAL):
+            return
+        self._saved_at = now
+        sweep = self.sweep
+        payload = {
+            "cutoff": sweep.cutoff.isoformat(),
+            "app_name": sweep.app_name,
+            "seen_review_ids": sorted(sweep.seen_review_ids),
+            "seen_fallback": sorted(sweep.seen_fallback),
+            "countries": {
+                scan.country: {
+                    "done": scan.done,
+                    "failed": scan.failed,
+                    "pages": scan.pages,
+                    "planned_pages": scan.planned_pages,
+                    "scanned": scan.scanned,
+                    "stop_due_to_old": scan.stop_due_to_old,
+                    "exhausted": scan.exhausted,
+                    "mark_held": scan.mark_held,
+                    "reached_known": scan.reached_known,
+                    "known": _mark_to_json(scan.known),
+                    "newest": _mark_to_json(scan.newest),
+                    "rows": scan.rows,
+                    "skipped": self.skipped.get(scan.country),
+                }
+                for scan in self.scans
+                if scan.done or scan.pages
+            },
+        }
+        blob = zlib.compress(json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sweep_checkpoints (key, payload, updated_at) VALUES (?, ?, ?)",
+                (self.key, blob, time.time()),
+            )
+
+    def clear(self):
+        with self.conn:
+            self.conn.execute("DELETE FROM sweep_checkpoints WHERE key = ?", (self.key,))
+
+def _restore_scan(scan: _CountryScan, saved: dict):
+    # недоделанная витрина продолжит со следующей страницы; витрина со сбоем считается недоделанной
+    scan.done = saved["done"] and not saved["failed"]
+    scan.failed = False
+    scan.pages = saved["pages"]
+    scan.planned_pages = saved["planned_pages"]
+    scan.scanned = saved["scanned"]
+    scan.stop_due_to_old = saved["stop_due_to_old"]
+    scan.exhausted = saved.get("exhausted", False)
+    scan.mark_held = saved.get("mark_held", False)
+    scan.reached_known = saved["reached_known"]
+    scan.known = _mark_from_json(saved["known"])
+    scan.newest = _mark_from_json(saved["newest"])
+    scan.rows = saved["rows"]
+
+def _stop_for_budget(ctx: FetchContext, scan: _CountryScan, where: str):
+    # недобранная витрина — как сбой: ни отметку, ни доходность по неполному прогону не пишем
+    ctx.stats.skipped[scan.country] = f"{where}: бюджет запросов исчерпан"
+    scan.failed = True
+
+
+async def _fetch_rss_feed(ctx: FetchContext, country: str, app_id: str, page: int) -> dict | None:
+    r = await request_with_retry(
+        ctx, build_rss_url(country, app_id, page), breaker_key=(country, "rss"), cache_policy="rss",
+    )
+    if not r:
+        return None
+    try:
+        return r.json()
+    except Exception:
+        return None
 
-        time.sleep(random.uniform(delay_between_requests_min, delay_between_requests_max))
+async def _fetch_rss_page(ctx: FetchContext, country: str, app_id: str, page: int) -> list[dict] | None:
+    feed_json = await _fetch_rss_feed(ctx, country, app_id, page)
+    if feed_json is None:
+        return None
+    return parse_rss_reviews(feed_json)
 
-        while scanned < per_country_limit and not stop_due_to_old:
-            rss_url = build_rss_url(country, app_id, page)
-            r = request_with_retry(session, rss_url)
-            time.sleep(random.uniform(delay_between_requests_min, delay_between_requests_max))
+def _consume_reviews(sweep: _Sweep, scan: _CountryScan, reviews: list[dict]):
+    for rv in reviews:
+        if scan.scanned >= sweep.per_country_limit:
+            break
 
-            if not r:
-                break
+        dt = parse_iso_date(rv.get("review_date_raw"))
+        if not dt:
+            continue
 
-            try:
-                feed_json = r.json()
-            except Exception:
-                break
+        if dt < sweep.cutoff:
+            scan.stop_due_to_old = True
+            break
+
+        if scan.known and (rv.get("review_id") == scan.known[0] or dt < scan.known[1]):
+            # дошли до уже собранного — дальше только старое
+            scan.reached_known = True
+            scan.stop_due_to_old = True
+            break
+
+        if scan.newest is None or dt > scan.newest[1]:
+            scan.newest = (rv.get("review_id"), dt)
+
+        review_id = rv.get("review_id") or ""
+        title = rv.get("title") or ""
+        text = rv.get("review_text") or ""
+        author = rv.get("author_name") or ""
+        rating = rv.get("rating")
+        version = rv.get("version")
+        review_date_iso = dt.isoformat()
+
+        # проверка и запись в дедуп-множества идут без await между ними,
+        # поэтому параллельные страны не гоняются друг с другом
+        if review_id:
+            if review_id in sweep.seen_review_ids:
+                continue
+        else:
+            fb = make_fallback_dedupe_key(author, review_date_iso, f"{title}\n{text}")
+            if fb in sweep.seen_fallback:
+                continue
+            sweep.seen_fallback.add(fb)
 
-            reviews = parse_rss_reviews(feed_json)
-            if not reviews:
-                break
+        scan.scanned += 1
+        if review_id:
+            sweep.seen_review_ids.add(review_id)
 
-            for rv in reviews:
-                if scanned >= per_country_limit:
-                    break
+        if not is_russian_text(title, text, threshold=sweep.ru_threshold):
+            continue
 
-                dt = parse_iso_date(rv.get("review_date_raw"))
-                if not dt:
-                    continue
+        scan.rows.append({
+            "app_id": sweep.app_id,
+            "app_name": sweep.app_name,
+            "country": scan.country,
+            "review_id": review_id if review_id else None,
+            "author_name": author,
+            "rating": rating,
+            "title": title,
+            "review_text": text,
+            "review_date": review_date_iso,
+            "version": version,
+            "language": "ru",
+            "source_url": sweep.app_url,
+        })
 
-                if dt < cutoff:
-                    stop_due_to_old = True
-                    break
+async def _probe_country(ctx: FetchContext, sweep: _Sweep, scan: _CountryScan) -> list[dict] | None:
+    # режим без lookup: доступность определяется по первой странице RSS
+    country = scan.country
+    lookup_would_cost = True
+    if ctx.lookup_cache is not None:
+        hit, data = ctx.lookup_cache.get(sweep.app_id, country)
+        if hit and data is None:
+            ctx.stats.skipped[country] = "приложение недоступно в стране (кэш lookup)"
+            return None
+        lookup_would_cost = not hit
 
-                review_id = rv.get("review_id") or ""
-                title = rv.get("title") or ""
-                text = rv.get("review_text") or ""
-                author = rv.get("author_name") or ""
-                rating = rv.get("rating")
-                version = rv.get("version")
-                review_date_iso = dt.isoformat()
-
-                if review_id:
-                    if review_id in seen_review_ids:
-                        continue
-                else:
-                    fb = make_fallback_dedupe_key(author, review_date_iso, f"{title}\n{text}")
-                    if fb in seen_fallback:
-                        continue
-                    seen_fallback.add(fb)
-
-                scanned += 1
-                if review_id:
-                    seen_review_ids.add(review_id)
-
-                if not is_russian_text(title, text, threshold=ru_threshold):
-                    continue
+    granted, feed_json = await _budgeted(sweep, scan, lambda: _fetch_rss_feed(ctx, country, sweep.app_id, 1))
+    if not granted:
+        _stop_for_budget(ctx, scan, "страница 1")
+        return None
+    if feed_json is None:
+        reason = ctx.breaker.describe((country, "rss")) or "RSS не ответил"
+        ctx.stats.skipped[country] = f"страница 1: {reason}"
+        scan.failed = True
+        return None
+
+    if sweep.app_name is None:
+        sweep.app_name = parse_rss_app_name(feed_json)
+
+    reviews = parse_rss_reviews(feed_json)
+    if not reviews:
+        ctx.stats.skipped[country] = "RSS пуст: нет отзывов или приложение недоступно"
+        return None
 
-                all_rows.append({
-                    "app_id": app_id,
-                    "app_name": app_name,
-                    "country": country,
-                    "review_id": review_id if review_id else None,
-                    "author_name": author,
-                    "rating": rating,
-                    "title": title,
-                    "review_text": text,
-                    "review_date": review_date_iso,
-                    "version": version,
-                    "language": "ru",
-                    "source_url": app_url,
-                })
+    # экономия засчитывается только там, где страна точно доступна:
+    # для недоступной витрины lookup-режим тоже тратит ровно один запрос
+    if lookup_would_cost:
+        ctx.stats.requests_saved += 1
+    return reviews
+
+def _take_page(ctx: FetchContext, sweep: _Sweep, scan: _CountryScan, page: int, reviews: list[dict] | None) -> bool:
+    # True — имеет смысл идти на следующую страницу
+    if reviews is None:
+        reason = ctx.breaker.describe((scan.country, "rss")) or "RSS не ответил"
+        ctx.stats.skipped[scan.country] = f"страница {page}: {reason}"
+        scan.failed = True
+        return False
+    scan.pages += 1
+    if not reviews or page >= RSS_MAX_PAGES:
+        scan.exhausted = True
+    if not reviews:
+        return False
+
+    _consume_reviews(sweep, scan, reviews)
+    if sweep.checkpoint is not None:
+        sweep.checkpoint.save()
+    if sweep.progress is not None:
+        sweep.progress.tick(scan.country)
+    if scan.scanned >= sweep.per_country_limit or scan.stop_due_to_old:
+        return False
+    return not _should_stop_early(ctx, sweep, scan)
+
+def _should_stop_early(ctx: FetchContext, sweep: _Sweep, scan: _CountryScan) -> bool:
+    if not sweep.early_stop:
+        return False
+    a, b = ru_rate_prior(sweep.history.get(scan.country))
+    kept = len(scan.rows)
+    next_page = min(RSS_PAGE_SIZE, sweep.per_country_limit - scan.scanned)
+    if chance_of_keepable(a, b, kept, scan.scanned, next_page) >= sweep.early_stop:
+        return False
+
+    # цена остановки: недобранные страницы по прикидке и ожидаемое число RU на них
+    pages_left = max(1, scan.planned_pages - scan.pages)
+    reviews_left = min(pages_left * RSS_PAGE_SIZE, sweep.per_country_limit - scan.scanned)
+    ctx.stats.early_stops += 1
+    ctx.stats.early_stop_requests_saved += pages_left
+    ctx.stats.early_stop_expected_missed += reviews_left * (a + kept) / (a + b + scan.scanned)
+    return True
+
+def _estimate_pages_needed(sweep: _Sweep, scan: _CountryScan, first_page: list[dict]) -> int:
+    # лента отсортирована по свежести: по времени, которое покрыла первая страница,
+    # прикидываем, сколько страниц уйдёт на окно days
+    by_limit = min(RSS_MAX_PAGES, max(1, math.ceil(sweep.per_country_limit / RSS_PAGE_SIZE)))
+    if len(first_page) < RSS_PAGE_SIZE:
+        return 1
+
+    dates = [d for d in (parse_iso_date(rv.get("review_date_raw")) for rv in first_page) if d]
+    if not dates:
+        return by_limit
+    oldest = min(dates)
+    floor = max(sweep.cutoff, scan.known[1]) if scan.known else sweep.cutoff
+    if oldest < floor:
+        return 1
+
+    now_utc = datetime.now(timezone.utc)
+    covered = (now_utc - oldest).total_seconds()
+    window = (now_utc - floor).total_seconds()
+    if covered <= 0:
+        return by_limit
+    return min(by_limit, math.ceil(window / covered) + 1)
+
+async def _scan_pages_parallel(ctx: FetchContext, sweep: _Sweep, scan: _CountryScan, first_page: list[dict] | None):
+    # глубокая история: страницы 2..k запрашиваются разом, разбираются строго по порядку;
+    # как только встретился отзыв старше cutoff, хвост отменяется
+    def fetch(page: int):
+        return _budgeted(sweep, scan, lambda: _fetch_rss_page(ctx, scan.country, sweep.app_id, page))
+
+    # продолжение прерванного прогона: разобранные страницы и план уже в scan
+    if not scan.pages:
+        if first_page is None:
+            granted, first_page = await fetch(1)
+            if not granted:
+                _stop_for_budget(ctx, scan, "страница 1")
+                return
+        if first_page:
+            scan.planned_pages = _estimate_pages_needed(sweep, scan, first_page)
+        if not _take_page(ctx, sweep, scan, 1, first_page):
+            return
+
+    # оценка по первой странице задаёт только размер пачки: лента может оказаться гуще к прошлому,
+    # поэтому, пока нет стоп-условия, идём следующей пачкой того же размера — до лимита страниц
+    by_limit = min(RSS_MAX_PAGES, max(1, math.ceil(sweep.per_country_limit / RSS_PAGE_SIZE)))
+    batch = max(1, scan.planned_pages - scan.pages)
+    # стоп-условия — как у последовательного обхода: витрина из чекпоинта могла уже упереться в них
+    more = not scan.stop_due_to_old and scan.scanned < sweep.per_country_limit
+    while more and scan.pages < by_limit:
+        scan.planned_pages = max(scan.planned_pages, min(by_limit, scan.pages + batch))
+        tasks = {p: asyncio.create_task(fetch(p)) for p in range(scan.pages + 1, scan.planned_pages + 1)}
+        try:
+            for p, task in tasks.items():
+                granted, reviews = await task
+                if not granted:
+                    _stop_for_budget(ctx, scan, f"страница {p}")
+                    more = False
+                    break
+                if not _take_page(ctx, sweep, scan, p, reviews):
+                    more = False
+                    break
+        finally:
+            pending = [t for t in tasks.values() if not t.done()]
+            for t in pending:
+                t.cancel()
+            ctx.stats.pages_cancelled += len(pending)
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+def _finish_country(ctx: FetchContext, sweep: _Sweep, scan: _CountryScan):
+    scan.done = True
+    if sweep.allocator is not None:
+        sweep.allocator.notify()
+    if scan.reached_known:
+        ctx.stats.known_reached += 1
+
+    # после сбоя посередине ни отметку, ни доходность не трогаем: прогон по стране неполный
+    if scan.failed:
+        return
+
+    if sweep.yields is not None:
+        sweep.yields.update(
+            sweep.app_id, scan.country,
+            requests=ctx.stats.requests_by_country.get(scan.country, 0),
+            scanned=scan.scanned,
+            kept=len(scan.rows),
+            caught_up=scan.reached_known,
+        )
 
+    if sweep.marks is None or scan.newest is None:
+        return
+    # отметка значит "всё новее неё собрано": сдвигать её можно, только если сбор дошёл до прошлой
+    # отметки, до cutoff или до конца ленты — иначе отзывы между обрывом и отметкой потерялись бы навсегда
+    if scan.known and not (scan.stop_due_to_old or scan.exhausted):
+        scan.mark_held = True
+        ctx.stats.skipped.setdefault(
+            scan.country, "до прошлой отметки не дошли (лимит на страну или ранняя остановка), отметка не сдвинута",
+        )
+        return
+    if scan.known and scan.newest[1] <= scan.known[1]:
+        return
+    sweep.marks.put(sweep.app_id, scan.country, scan.newest[0], scan.newest[1])
+
+def _coverage_status(scan: _CountryScan) -> str:
+    if scan.done and not scan.failed and not scan.mark_held:
+        return "finished"
+    return "partial" if scan.pages else "skipped"
+
+async def _scrape_country(ctx: FetchContext, sweep: _Sweep, scan: _CountryScan) -> _CountryScan:
+    country = scan.country
+    resumed = scan.pages > 0
+    if sweep.marks is not None and not resumed:
+        scan.known = sweep.marks.get(sweep.app_id, country)
+
+    # у продолженной витрины доступность уже проверена прошлым прогоном
+    first_page = None
+    if resumed:
+        pass
+    elif sweep.probe_rss:
+        first_page = await _probe_country(ctx, sweep, scan)
+        if first_page is None:
+            _finish_country(ctx, sweep, scan)
+            return scan
+    else:
+        granted, answer = await _budgeted(sweep, scan, lambda: itunes_lookup(ctx, sweep.app_id, country))
+        if not granted:
+            _stop_for_budget(ctx, scan, "lookup")
+            _finish_country(ctx, sweep, scan)
+            return scan
+        final, lookup = answer
+        if not lookup:
+            # "недоступно" — только по окончательному ответу; битое тело, отмена, дедлайн — сбой
+            reason = None if final else ctx.breaker.describe((country, "lookup")) or "lookup не дал ответа"
+            ctx.stats.skipped[country] = reason or "приложение недоступно в стране"
+            scan.failed = not final
+            _finish_country(ctx, sweep, scan)
+            return scan
+
+    if sweep.deep_history:
+        await _scan_pages_parallel(ctx, sweep, scan, first_page)
+    else:
+        page = scan.pages + 1
+        while scan.scanned < sweep.per_country_limit and not scan.stop_due_to_old:
+            if page == 1 and first_page is not None:
+                reviews = first_page
+            else:
+                granted, reviews = await _budgeted(
+                    sweep, scan, lambda: _fetch_rss_page(ctx, country, sweep.app_id, page),
+                )
+                if not granted:
+                    _stop_for_budget(ctx, scan, f"страница {page}")
+                    break
+            if page == 1 and reviews:
+                scan.planned_pages = _estimate_pages_needed(sweep, scan, reviews)
+            if not _take_page(ctx, sweep, scan, page, reviews):
+                break
             page += 1
 
+    _finish_country(ctx, sweep, scan)
+    return scan
+
+def _build_reviews_frame(all_rows: list[dict]) -> pd.DataFrame:
     df = pd.DataFrame(all_rows)
 
-    base_cols = [
-        "app_id","app_name","country","review_id","author_name","rating",
-        "title","review_text","review_date","version","language","source_url"
-    ]
-    for c in base_cols:
+    for c in BASE_COLS:
         if c not in df.columns:
             df[c] = None
 
@@ -455,16 +2352,618 @@ def scrape_appstore_reviews_all_countries(
         for t in TOPIC_ORDER:
             df[f"topic_{t}"] = 0
 
-    final_cols = [
-        "app_id","app_name","country","review_id","author_name","rating",
-        "title","review_text","review_date","version","language",
-        "topic_tags","topic_onboarding","topic_streak","topic_ads",
-        "topic_subscription","topic_bugs","topic_motivation",
-        "source_url",
-    ]
-    df = df[final_cols]
+    return df[FINAL_COLS]
+
+@asynccontextmanager
+async def _fetch_session(
+    client: httpx.AsyncClient,
+    concurrency: int,
+    initial_rate: float,
+    max_rate: float,
+    use_lookup_cache: bool,
+    use_http_cache: bool = True,
+    state_path: str | None = None,
+    hedging: bool = False,
+    shared_rate: float | None = None,
+    cancel_token: CancelToken | None = None,
+):
+    # клиент живёт дольше прогона (транспорт или запись/воспроизведение); здесь — только состояние прогона
+    state_db = open_state_db(state_path)
+    limiter = SharedRateLimiter(shared_rate, path=state_path) if shared_rate else None
+    ctx = FetchContext(
+        client=client,
+        concurrency=max(1, int(concurrency)),
+        rate=AimdRateController(initial_rate=min(initial_rate, max_rate), max_rate=max_rate),
+        lookup_cache=LookupCache(state_db) if use_lookup_cache else None,
+        http_cache=HttpCache(state_db) if use_http_cache else None,
+        state_db=state_db,
+        hedging=hedging,
+        latency=LatencyHistograms(state_db),
+        shared_rate=limiter,
+        cancel=cancel_token,
+    )
+    try:
+        yield ctx
+    finally:
+        # недоработавшие после хеджа запросы не должны пережить прогон на общем клиенте
+        for task in list(ctx.background):
+            task.cancel()
+        await asyncio.gather(*ctx.background, return_exceptions=True)
+        ctx.latency.flush()
+        if limiter is not None:
+            limiter.close()
+        state_db.close()
+
+async def _scrape_all_countries(
+    ctx: FetchContext,
+    app_url: str,
+    per_country_limit: int,
+    days: int,
+    ru_threshold: float,
+    probe_rss: bool,
+    progress_callback,
+    countries: list[str] | None = None,
+    deep_history: bool = False,
+    incremental: bool = False,
+    order_by_yield: bool = True,
+    skip_zero_yield_runs: int | None = None,
+    deadline: float | None = None,
+    max_requests: int | None = None,
+    early_stop: float | None = None,
+    resume: bool = False,
+    now: datetime | None = None,
+) -> pd.DataFrame:
+    loop = asyncio.get_running_loop()
+    if deadline is not None:
+        ctx.deadline_at = loop.time() + deadline
+    app_id = extract_app_id(app_url)
+    default_country = extract_default_country_from_url(app_url)
+
+    # продолжение прерванного прогона с теми же параметрами: окно дат — как у исходного прогона
+    checkpoint, saved = None, None
+    if resume and ctx.state_db is not None:
+        checkpoint = SweepCheckpoint(ctx.state_db, checkpoint_key(
+            app_id=app_id, countries=sorted(countries) if countries is not None else None,
+            per_country_limit=per_country_limit, days=days, ru_threshold=ru_threshold,
+            probe_rss=probe_rss, deep_history=deep_history, incremental=incremental,
+        ))
+        saved = checkpoint.load()
+
+    # в режиме probe_rss имя берётся из ленты, lookup — только если лента его не дала
+    app_name = saved["app_name"] if saved else None
+    if not probe_rss and app_name is None:
+        app_name = await get_app_name(ctx, app_id, preferred_country=default_country)
+    now_utc = now or datetime.now(timezone.utc)
+
+    sweep = _Sweep(
+        app_id=app_id,
+        app_name=app_name,
+        app_url=app_url,
+        cutoff=parse_iso_date(saved["cutoff"]) if saved else now_utc - relativedelta(days=days),
+        per_country_limit=per_country_limit,
+        ru_threshold=ru_threshold,
+        probe_rss=probe_rss,
+        deep_history=deep_history,
+        marks=HighWaterMarks(ctx.state_db) if incremental and ctx.state_db is not None else None,
+        yields=YieldStats(ctx.state_db) if ctx.state_db is not None else None,
+        early_stop=early_stop,
+    )
+
+    order = [default_country] + [c for c in STORE_FRONTS if c != default_country]
+    if countries is not None:
+        allowed = set(countries)
+        order = [c for c in order if c in allowed]
+    # с дедлайном или бюджетом запросов порядок по ценности обязателен: иначе до ценных витрин можно не дойти
+    order_by_yield = order_by_yield or deadline is not None or bool(max_requests)
+    history = {}
+    if sweep.yields is not None and (order_by_yield or skip_zero_yield_runs or early_stop):
+        history = sweep.history = sweep.yields.load(app_id)
+        planned, skipped = plan_countries_by_yield(order, history, skip_zero_yield_runs)
+        order = planned if order_by_yield else [c for c in order if c not in skipped]
+        ctx.stats.skipped.update(skipped)
+        ctx.stats.coverage.update({c: "skipped" for c in skipped})
+        if order_by_yield:
+            ctx.priorities.update(expected_request_value(order, history))
+    by_limit = min(RSS_MAX_PAGES, max(1, math.ceil(per_country_limit / RSS_PAGE_SIZE)))
+
+    async def run_country(scan: _CountryScan) -> _CountryScan:
+        if not scan.done:
+            await _scrape_country(ctx, sweep, scan)
+        if sweep.progress is not None:
+            sweep.progress.tick(scan.country)
+        return scan
+
+    # все страны стартуют сразу в порядке плана; очередь темпа отдаёт слоты по ценности
+    # страны, реальную параллельность ограничивает семафор хоста.
+    # На дедлайне недоделанные страны отменяются, собранное ими до этого остаётся в scan
+    scans = [_CountryScan(c) for c in order]
+    if saved:
+        sweep.seen_review_ids.update(saved["seen_review_ids"])
+        sweep.seen_fallback.update(saved["seen_fallback"])
+        for scan in scans:
+            entry = saved["countries"].get(scan.country)
+            if entry is None:
+                continue
+            _restore_scan(scan, entry)
+            ctx.stats.resumed_pages += scan.pages
+            if scan.done:
+                ctx.stats.resumed_countries += 1
+                if entry["skipped"]:
+                    ctx.stats.skipped[scan.country] = entry["skipped"]
+    if checkpoint is not None:
+        checkpoint.attach(sweep, scans, ctx.stats.skipped)
+        sweep.checkpoint = checkpoint
+    if max_requests:
+        sweep.allocator = RequestAllocator(
+            max_requests, ctx.stats, expected_request_value(order, history), ctx.priorities,
+        )
+        sweep.allocator.register(scans, by_limit)
+        ctx.allocator = sweep.allocator
+    if progress_callback:
+        sweep.progress = ProgressTracker(ctx, scans, by_limit, progress_callback)
+        sweep.progress.tick(force=True)
+    tasks = [asyncio.create_task(run_country(scan)) for scan in scans]
+    # ждём все страны, но не дольше дедлайна и до первой отмены пользователем
+    stopper = asyncio.ensure_future(ctx.cancel.wait()) if ctx.cancel is not None else None
+    remaining = set(tasks)
+    completed = False
+    try:
+        while remaining:
+            timeout = None if ctx.deadline_at is None else ctx.deadline_at - loop.time()
+            if timeout is not None and timeout <= 0:
+                break
+            finished, _ = await asyncio.wait(
+                remaining | ({stopper} if stopper else set()), timeout=timeout, return_when=asyncio.FIRST_COMPLETED,
+            )
+            for t in finished - {stopper}:
+                t.result()
+            remaining -= finished
+            if not finished or (stopper is not None and stopper.done()):
+                break
+        completed = not remaining
+    finally:
+        if stopper is not None:
+            stopper.cancel()
+        pending = [t for t in tasks if not t.done()]
+        for t in pending:
+            t.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        # прерванный (rerun, ошибка, дедлайн) прогон оставляет чекпоинт, доведённый до конца — стирает
+        if checkpoint is not None:
+            if completed:
+                checkpoint.clear()
+            else:
+                checkpoint.save(force=True)
+
+    ctx.stats.cancelled = bool(ctx.cancel is not None and ctx.cancel.cancelled)
+    if sweep.progress is not None:
+        sweep.progress.tick(force=True)
+    for scan in scans:
+        status = _coverage_status(scan)
+        ctx.stats.coverage[scan.country] = status
+        if not scan.done:
+            ctx.stats.skipped.setdefault(scan.country, "сбор остановлен" if ctx.stats.cancelled else "не успели до дедлайна")
+
+    if probe_rss and sweep.app_name is None and not ctx.stats.cancelled:
+        requests_before = ctx.stats.requests
+        sweep.app_name = await get_app_name(ctx, app_id, preferred_country=default_country)
+        ctx.stats.requests_saved -= ctx.stats.requests - requests_before
+
+    all_rows = [row for scan in scans for row in scan.rows]
+    if probe_rss:
+        for row in all_rows:
+            row["app_name"] = row["app_name"] or sweep.app_name
+    df = _build_reviews_frame(all_rows)
+    df.attrs["run_stats"] = ctx.stats.as_dict()
     return df
 
+@dataclass(frozen=True)
+class ScrapeOptions:
+    # параметры сбора по всем странам — одно место для имён и значений по умолчанию
+    per_country_limit: int = 50
+    days: int = 7
+    ru_threshold: float = 0.55
+    concurrency: int = 8
+    initial_rate: float = 4.0
+    max_rate: float = 20.0
+    use_lookup_cache: bool = True
+    probe_rss: bool = False
+    deep_history: bool = False
+    incremental: bool = False
+    order_by_yield: bool = True
+    skip_zero_yield_runs: int | None = None
+    deadline: float | None = None
+    max_requests: int | None = None
+    early_stop: float | None = None
+    resume: bool = True
+    countries: list[str] | None = None
+    http2: bool = True
+    use_http_cache: bool = True
+    record_to: str | None = None
+    replay_from: str | None = None
+    replay_latency: bool = False
+    hedging: bool = False
+    shared_rate: float | None = SHARED_RATE_LIMIT
+
+def _all_countries_job(app_url: str, opts: ScrapeOptions, cancel_token: CancelToken):
+    # (транспорт, фабрика корутины сбора) — запускают её блокирующе или в фоне
+    transport = get_transport()
+    pooled = transport.client(opts.concurrency, opts.http2)
+
+    # запись и воспроизведение идут мимо кэшей, иначе архив не покроет все запросы прогона;
+    # воспроизведение к тому же не трогает локальное состояние и считает "сейчас" моментом записи
+    archive = TrafficArchive.load(opts.replay_from) if opts.replay_from else None
+    use_lookup_cache, use_http_cache = opts.use_lookup_cache, opts.use_http_cache
+    if opts.record_to or archive is not None:
+        use_lookup_cache = use_http_cache = False
+    state_path = ":memory:" if archive is not None else None
+    initial_rate, max_rate, shared_rate = opts.initial_rate, opts.max_rate, opts.shared_rate
+    if archive is not None:
+        shared_rate = None
+        # без записанных задержек воспроизведение меряет только разбор и фильтрацию: темп не ограничиваем
+        if not opts.replay_latency:
+            initial_rate = max_rate = math.inf
+
+    async def run(report):
+        async with (
+            _traffic_client(pooled, opts.concurrency, opts.http2, opts.record_to, archive, opts.replay_latency) as client,
+            _fetch_session(
+                client, opts.concurrency, initial_rate, max_rate, use_lookup_cache, use_http_cache, state_path,
+                opts.hedging, shared_rate, cancel_token,
+            ) as ctx,
+        ):
+            df = await _scrape_all_countries(
+                ctx,
+                app_url=app_url,
+                per_country_limit=opts.per_country_limit,
+                days=opts.days,
+                ru_threshold=opts.ru_threshold,
+                probe_rss=opts.probe_rss,
+                progress_callback=report,
+                countries=opts.countries,
+                deep_history=opts.deep_history,
+                incremental=opts.incremental,
+                order_by_yield=opts.order_by_yield,
+                skip_zero_yield_runs=opts.skip_zero_yield_runs,
+                deadline=opts.deadline,
+                max_requests=opts.max_requests,
+                early_stop=opts.early_stop,
+                resume=opts.resume and archive is None,
+                now=archive.recorded_at if archive is not None else None,
+            )
+        if archive is not None:
+            df.attrs["run_stats"]["replay"] = {"served": archive.served, "misses": archive.misses}
+        return df
+
+    return transport, run
+
+def start_scrape_appstore_reviews_all_countries(
+    app_url: str,
+    *,
+    options: ScrapeOptions | None = None,
+    cancel_token: CancelToken | None = None,
+    **overrides,
+) -> ScrapeHandle:
+    # сбор без ожидания: идёт в потоке транспорта, ход и результат — через ScrapeHandle.
+    # overrides — поля ScrapeOptions поверх options; неизвестное имя — TypeError сразу
+    opts = replace(options or ScrapeOptions(), **overrides)
+    cancel_token = cancel_token or CancelToken()
+    transport, job = _all_countries_job(app_url, opts, cancel_token)
+    return transport.submit(job, cancel_token)
+
+def scrape_appstore_reviews_all_countries(
+    app_url: str,
+    *,
+    options: ScrapeOptions | None = None,
+    progress_callback=None,
+    cancel_token: CancelToken | None = None,
+    **overrides,
+) -> pd.DataFrame:
+    # блокирующий вариант; прерывание вызывающего потока отменяет и сбор
+    handle = start_scrape_appstore_reviews_all_countries(
+        app_url, options=options, cancel_token=cancel_token, **overrides,
+    )
+    try:
+        return handle.wait(progress_callback)
+    except BaseException:
+        handle.future.cancel()
+        raise
+
+# -----------------------------
+# Фоновые сборы: очередь задач и воркеры, не связанные с прогоном скрипта Streamlit.
+# В таблице scrape_jobs — статус и последний прогресс (по ним страница подхватывает задачу
+# после перезагрузки), сам результат — в памяти процесса
+# -----------------------------
+JOB_WORKERS = int(os.environ.get("APPSTORE_JOB_WORKERS", "1"))
+JOB_PROGRESS_SAVE_INTERVAL = 2.0
+JOB_POLL_INTERVAL = 0.5
+JOB_KEEP_RESULTS = 20
+JOB_FINAL_STATUSES = ("done", "cancelled", "failed", "interrupted")
+
+def _pid_alive(pid: int | None) -> bool:
+    if pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except PermissionError:
+        return True
+    except (OSError, TypeError):
+        return False
+    return True
+
+@dataclass
+class ScrapeJob:
+    id: str
+    app_url: str
+    options: dict
+    # queued | running | done | cancelled | failed | interrupted (процесс перезапустился посреди сбора)
+    status: str = "queued"
+    created_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+    progress: ScrapeProgress | None = None
+    error: str | None = None
+    result: pd.DataFrame | None = None
+    cancel_token: CancelToken = field(default_factory=CancelToken)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in JOB_FINAL_STATUSES
+
+class JobRunner:
+    def __init__(self, workers: int = JOB_WORKERS, path: str | None = None):
+        self.conn = open_state_db(path)
+        self.jobs: dict[str, ScrapeJob] = {}
+        self.queue: queue.Queue[str] = queue.Queue()
+        self._lock = threading.Lock()
+        with self._lock, self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS scrape_jobs ("
+                "id TEXT PRIMARY KEY, app_url TEXT, options TEXT, status TEXT, pid INTEGER, "
+                "created_at REAL, started_at REAL, finished_at REAL, progress TEXT, error TEXT)"
+            )
+            # задачи завершившихся процессов, которые те не довели: повторный запуск продолжит их с чекпоинта.
+            # Базу могут делить несколько процессов — задачи живых не трогаем
+            orphaned = [
+                (time.time(), job_id)
+                for job_id, pid in self.conn.execute(
+                    "SELECT id, pid FROM scrape_jobs WHERE status IN ('queued', 'running')"
+                ).fetchall()
+                if not _pid_alive(pid)
+            ]
+            self.conn.executemany(
+                "UPDATE scrape_jobs SET status = 'interrupted', finished_at = ? WHERE id = ?", orphaned,
+            )
+        for i in range(max(1, workers)):
+            threading.Thread(target=self._work, name=f"scrape-job-{i}", daemon=True).start()
+
+    def submit(self, app_url: str, **options) -> str:
+        # options — поля ScrapeOptions; опечатка в имени падает здесь, а не в воркере
+        ScrapeOptions(**options)
+        job = ScrapeJob(id=uuid.uuid4().hex[:12], app_url=app_url, options=options)
+        with self._lock:
+            self.jobs[job.id] = job
+        self._save(job)
+        self.queue.put(job.id)
+        return job.id
+
+    def get(self, job_id: str) -> ScrapeJob | None:
+        # задача другого процесса (до перезапуска) — только статус и прогресс, без результата
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return job
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT id, app_url, options, status, created_at, started_at, finished_at, progress, error "
+                "FROM scrape_jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        return self._from_row(row) if row else None
+
+    def recent(self, limit: int = 10) -> list[ScrapeJob]:
+        with self._lock:
+            ids = [r[0] for r in self.conn.execute(
+                "SELECT id FROM scrape_jobs ORDER BY created_at DESC LIMIT ?", (limit,),
+            ).fetchall()]
+        return [job for job in map(self.get, ids) if job is not None]
+
+    def queued_before(self, job: ScrapeJob) -> int:
+        with self._lock:
+            return sum(1 for j in self.jobs.values() if j.status == "queued" and j.created_at < job.created_at)
+
+    def cancel(self, job_id: str):
+        job = self.jobs.get(job_id)
+        if job is None or job.finished:
+            return
+        job.cancel_token.cancel()
+        with self._lock:
+            # из очереди задача просто снимается; идущая — сворачивается сама и отдаёт собранное
+            if job.status == "queued":
+                job.status = "cancelled"
+                job.finished_at = time.time()
+        self._save(job)
+
+    def _work(self):
+        while True:
+            job = self.jobs.get(self.queue.get())
+            with self._lock:
+                if job is None or job.status != "queued":
+                    continue
+                job.status = "running"
+                job.started_at = time.time()
+            self._save(job)
+
+            saved_at = time.monotonic()
+
+            def on_progress(p: ScrapeProgress):
+                nonlocal saved_at
+                job.progress = p
+                if time.monotonic() - saved_at >= JOB_PROGRESS_SAVE_INTERVAL:
+                    saved_at = time.monotonic()
+                    self._save(job)
+
+            try:
+                handle = start_scrape_appstore_reviews_all_countries(
+                    job.app_url, options=ScrapeOptions(**job.options), cancel_token=job.cancel_token,
+                )
+                result = handle.wait(on_progress)
+                status = "cancelled" if result.attrs.get("run_stats", {}).get("cancelled") else "done"
+            except Exception as e:
+                result, status = None, "failed"
+                job.error = str(e) or type(e).__name__
+            with self._lock:
+                job.result, job.status, job.finished_at = result, status, time.time()
+                self._forget_old_results()
+            self._save(job)
+
+    def _forget_old_results(self):
+        # в памяти держим результаты только последних JOB_KEEP_RESULTS задач
+        finished = sorted((j for j in self.jobs.values() if j.finished), key=lambda j: j.finished_at or 0)
+        for j in finished[:-JOB_KEEP_RESULTS]:
+            del self.jobs[j.id]
+
+    def _save(self, job: ScrapeJob):
+        progress = json.dumps(asdict(job.progress)) if job.progress is not None else None
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO scrape_jobs "
+                "(id, app_url, options, status, pid, created_at, started_at, finished_at, progress, error) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job.id, job.app_url, json.dumps(job.options), job.status, os.getpid(), job.created_at,
+                 job.started_at, job.finished_at, progress, job.error),
+            )
+
+    @staticmethod
+    def _from_row(row) -> ScrapeJob:
+        job_id, app_url, options, status, created_at, started_at, finished_at, progress, error = row
+        return ScrapeJob(
+            id=job_id, app_url=app_url, options=json.loads(options), status=status,
+            created_at=created_at, started_at=started_at, finished_at=finished_at,
+            progress=ScrapeProgress(**json.loads(progress)) if progress else None, error=error,
+        )
+
+@st.cache_resource
+def get_job_runner() -> JobRunner:
+    # одна очередь на процесс, общая для всех сессий
+    return JobRunner()
+
+def build_availability_matrix(
+    app_ids: list[str],
+    countries: list[str] | None = None,
+    concurrency: int = 8,
+    initial_rate: float = 4.0,
+    max_rate: float = 20.0,
+    http2: bool = True,
+    shared_rate: float | None = SHARED_RATE_LIMIT,
+) -> pd.DataFrame:
+    transport = get_transport()
+    client = transport.client(concurrency, http2)
+
+    async def run(_report):
+        async with _fetch_session(
+            client, concurrency, initial_rate, max_rate, use_lookup_cache=True, shared_rate=shared_rate,
+        ) as ctx:
+            return await lookup_availability_matrix(ctx, app_ids, countries)
+
+    return transport.run(run)
+
+def scrape_appstore_reviews_many_apps(
+    app_urls: list[str],
+    per_country_limit: int = 50,
+    days: int = 7,
+    ru_threshold: float = 0.55,
+    concurrency: int = 8,
+    initial_rate: float = 4.0,
+    max_rate: float = 20.0,
+    http2: bool = True,
+    shared_rate: float | None = SHARED_RATE_LIMIT,
+    progress_callback=None,
+) -> pd.DataFrame:
+    # сначала одна матрица доступности на все приложения (запросов ~ число стран),
+    # затем каждое приложение обходит только свои страны; lookup по ним уже в кэше
+    transport = get_transport()
+    client = transport.client(concurrency, http2)
+
+    async def run(report):
+        async with _fetch_session(
+            client, concurrency, initial_rate, max_rate, use_lookup_cache=True, shared_rate=shared_rate,
+        ) as ctx:
+            app_ids = [extract_app_id(u) for u in app_urls]
+            matrix = await lookup_availability_matrix(ctx, app_ids)
+
+            frames = []
+            stats_by_app = {}
+            for app_url, app_id in zip(app_urls, app_ids):
+                row = matrix.loc[app_id]
+                # <NA> (страну не удалось проверить) оставляем в плане — решит обычный lookup
+                planned = [c for c in matrix.columns if pd.isna(row[c]) or bool(row[c])]
+                app_ctx = replace(ctx, stats=RunStats(), priorities={})
+                df = await _scrape_all_countries(
+                    app_ctx,
+                    app_url=app_url,
+                    per_country_limit=per_country_limit,
+                    days=days,
+                    ru_threshold=ru_threshold,
+                    probe_rss=False,
+                    progress_callback=report,
+                    countries=planned,
+                )
+                frames.append(df)
+                stats_by_app[app_id] = df.attrs["run_stats"]
+
+        out = pd.concat(frames, ignore_index=True) if frames else _build_reviews_frame([])
+        out.attrs["availability"] = matrix
+        out.attrs["run_stats_by_app"] = stats_by_app
+        return out
+
+    return transport.run(run, progress_callback)
+
+
+def http_cache_hit_rate(run_stats: dict) -> float:
+    # 304 тоже попадание: тело не качали, хоть и сходили в сеть
+    hits = run_stats.get("http_cache_hits", 0) + run_stats.get("http_cache_revalidated", 0)
+    total = hits + run_stats.get("http_cache_misses", 0)
+    return hits / total if total else 0.0
+
+
+# -----------------------------
+# Результат сбора в сессии: таблица и её CSV. CSV собирается лениво (по клику "Скачать")
+# и один раз на версию результата; повторные прогоны скрипта его не пересобирают
+# -----------------------------
+SESSION_KEEP_RESULTS = 3
+
+class ResultExport:
+    def __init__(self, df: pd.DataFrame, app_url: str, options: dict, version: float | None):
+        self.df = df
+        self.app_url = app_url
+        self.options = options
+        self.version = version
+        self._csv: bytes | None = None
+        # download_button вызывает генератор в отдельном потоке
+        self._lock = threading.Lock()
+
+    def csv_bytes(self) -> bytes:
+        with self._lock:
+            if self._csv is None:
+                # pandas кодирует в байтовый буфер кусками: без промежуточной str на всю таблицу
+                buf = io.BytesIO()
+                self.df.to_csv(buf, index=False, encoding="utf-8", quoting=csv.QUOTE_ALL)
+                self._csv = buf.getvalue()
+            return self._csv
+
+    def forget_csv(self):
+        with self._lock:
+            self._csv = None
+
+def remember_result(results: dict[str, ResultExport], job_id: str, export: ResultExport):
+    # в сессии живут только последние SESSION_KEEP_RESULTS результатов (просмотренный — самый свежий);
+    # у вытесненных сразу отпускаем и CSV
+    results.pop(job_id, None)
+    results[job_id] = export
+    while len(results) > SESSION_KEEP_RESULTS:
+        old = results.pop(next(iter(results)))
+        old.forget_csv()
+
 
 # ===========================================
 # UI
@@ -478,51 +2977,210 @@ with st.sidebar:
         "App Store URL",
         value="https://apps.apple.com/us/app/duolingo-language-lessons/id570060128"
     )
-    per_country_limit = st.slider("Лимит на страну", 5, 50, 50, 5)
+    deep_history = st.checkbox("Глубокая история (до 10 страниц параллельно)", value=False)
+    per_country_limit = st.slider(
+        "Лимит на страну", 5, RSS_PAGE_SIZE * RSS_MAX_PAGES if deep_history else RSS_PAGE_SIZE, 50, 5,
+    )
     days = st.slider("Период (дней назад)", 1, 30, 7, 1)
     ru_threshold = st.slider("RU-порог (доля кириллицы)", 0.30, 0.90, 0.55, 0.05)
 
     st.divider()
-    st.write("Скорость (чтобы меньше ловить 429):")
-    delay_min = st.slider("Пауза min (сек)", 0.0, 2.0, 0.25, 0.05)
-    delay_max = st.slider("Пауза max (сек)", 0.0, 3.0, 0.55, 0.05)
-    if delay_max < delay_min:
-        st.warning("delay_max должен быть ≥ delay_min")
+    st.write("Скорость подбирается автоматически (AIMD по ответам 429/503)")
+    if SHARED_RATE_LIMIT:
+        st.caption(f"Общий лимит для всех запусков на этой машине: {SHARED_RATE_LIMIT:g} запр/с (APPSTORE_SHARED_RATE)")
+    concurrency = st.slider("Параллельных запросов", 1, 32, 8, 1)
+    probe_rss = st.checkbox("Доступность по RSS (без lookup)", value=False)
+    incremental = st.checkbox("Только новые с прошлого запуска", value=False)
+    skip_zero_yield_runs = st.number_input(
+        "Пропускать страны без RU-отзывов N запусков подряд (0 — не пропускать)", 0, 20, 0, 1,
+    )
+    deadline_s = st.number_input("Лимит времени, сек (0 — без лимита)", 0, 3600, 0, 10)
+    max_requests = st.number_input("Бюджет запросов на прогон (0 — без лимита)", 0, 5000, 0, 10)
+    early_stop = st.slider(
+        "Бросать страну, если шанс RU-отзыва на следующей странице ниже (0 — не бросать)", 0.0, 0.5, 0.0, 0.01,
+    )
+    hedging = st.checkbox("Дублировать медленные запросы (дольше p95)", value=False)
+    resume = st.checkbox("Продолжить прерванный сбор с теми же параметрами", value=True)
+
+    with st.expander("Запись / воспроизведение трафика"):
+        record_to = st.text_input("Записать в архив (.jsonl.gz)", value="")
+        replay_from = st.text_input("Воспроизвести из архива (.jsonl.gz)", value="")
+        replay_latency = st.checkbox("Воспроизводить записанные задержки", value=False)
+
+col_run, col_stop = st.columns(2)
+run_btn = col_run.button("🚀 Запустить сбор")
+stop_btn = col_stop.button("⏹ Остановить")
+
+# сбор — фоновая задача JobRunner: скрипт только ставит её в очередь и опрашивает.
+# id задачи — в адресе страницы (?job=...), поэтому после перезагрузки страница подхватывает
+# её снова; новые сборы встают в очередь за уже идущими
+runner = get_job_runner()
+job_id = st.query_params.get("job")
+if stop_btn and job_id:
+    runner.cancel(job_id)
 
-run_btn = st.button("🚀 Запустить сбор")
+if run_btn:
+    job_id = runner.submit(
+        app_url,
+        per_country_limit=per_country_limit,
+        days=days,
+        ru_threshold=ru_threshold,
+        concurrency=concurrency,
+        probe_rss=probe_rss,
+        deep_history=deep_history,
+        incremental=incremental,
+        skip_zero_yield_runs=skip_zero_yield_runs or None,
+        deadline=deadline_s or None,
+        max_requests=max_requests or None,
+        early_stop=early_stop or None,
+        resume=resume,
+        record_to=record_to or None,
+        replay_from=replay_from or None,
+        replay_latency=replay_latency,
+        hedging=hedging,
+    )
+    st.query_params["job"] = job_id
 
-progress_bar = st.progress(0, text="Ожидание запуска...")
+job = runner.get(job_id) if job_id else None
 
-def progress_cb(progress_value: float, country: str):
-    progress_bar.progress(int(progress_value * 100), text=f"Сбор... ({country})")
+def progress_text(p: ScrapeProgress) -> str:
+    if p.eta_s is None:
+        eta = "оценка остатка…"
+    else:
+        eta = f"осталось ~{int(p.eta_s // 60)}:{int(p.eta_s % 60):02d}"
+    return (
+        f"Сбор... ({p.country or '—'}) · запросы {p.requests_done}/{p.requests_planned} · "
+        f"страны {p.countries_done}/{p.countries_total} · страниц {p.pages} · "
+        f"отзывов {p.scanned}, RU {p.kept} · повторов {p.retries} · "
+        f"{p.throughput:.1f} запр/с (темп {p.rate:.1f}) · {eta}"
+    )
 
-if run_btn:
-    try:
-        df = scrape_appstore_reviews_all_countries(
-            app_url=app_url,
-            per_country_limit=per_country_limit,
-            days=days,
-            ru_threshold=ru_threshold,
-            delay_between_requests_min=delay_min,
-            delay_between_requests_max=delay_max,
-            progress_callback=progress_cb,
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def job_progress(job_id: str):
+    # опрос перерисовывает только этот блок; сбор идёт в воркере и от прогонов скрипта не зависит.
+    # Когда сбор закончился — полный прогон скрипта, чтобы показать результат
+    job = runner.get(job_id)
+    if job is None or job.finished:
+        st.rerun()
+    if job.status == "queued":
+        st.progress(0, text=f"В очереди, перед этим сбором: {runner.queued_before(job)}")
+    elif job.progress is None:
+        st.progress(0, text="Сбор...")
+    else:
+        st.progress(int(job.progress.fraction * 100), text=progress_text(job.progress))
+
+if job is not None and not job.finished:
+    job_progress(job.id)
+else:
+    progress_bar = st.progress(0, text="Ожидание запуска...")
+
+with st.expander("Очередь сборов"):
+    jobs = runner.recent()
+    if jobs:
+        st.dataframe(
+            pd.DataFrame(
+                [
+                    (
+                        j.id, j.app_url, j.status,
+                        f"{j.progress.fraction:.0%}" if j.progress is not None else "",
+                        datetime.fromtimestamp(j.created_at).strftime("%H:%M:%S"),
+                    )
+                    for j in jobs
+                ],
+                columns=["job", "app_url", "status", "progress", "created"],
+            ),
+            use_container_width=True,
         )
-        progress_bar.progress(100, text="Готово ✅")
+    else:
+        st.caption("Сборов пока не было")
+
+if job_id and job is None:
+    st.warning(f"Сбор {job_id} не найден")
+
+# результаты — в session_state по id сбора: переживают прогоны скрипта и вытеснение из JobRunner
+results: dict[str, ResultExport] = st.session_state.setdefault("results", {})
+if job is not None and job.finished:
+    stored = results.get(job.id)
+    if job.result is not None and (stored is None or stored.version != job.finished_at):
+        if stored is not None:
+            stored.forget_csv()
+        stored = ResultExport(job.result, job.app_url, job.options, job.finished_at)
+    if stored is not None:
+        remember_result(results, job.id, stored)
+
+if job is not None and job.finished:
+    result = results.get(job.id)
+    if job.status == "failed":
+        progress_bar.progress(0, text="Ошибка ❌")
+        st.error(f"Ошибка: {job.error}")
+    elif result is None and job.status == "cancelled" and job.started_at is None:
+        progress_bar.progress(0, text="Отменён до начала ⏹")
+    elif result is None:
+        progress_bar.progress(0, text="Результат недоступен")
+        st.warning(
+            "Результат этого сбора не сохранился (приложение перезапускалось). "
+            "Запустите сбор с теми же параметрами — он продолжится с сохранённого места."
+        )
+    else:
+        df = result.df
+        run_stats = df.attrs.get("run_stats", {})
+        hedging_used = result.options.get("hedging")
+        early_stop_used = result.options.get("early_stop")
+        if job.status == "cancelled":
+            progress_bar.progress(100, text="Остановлено — показано собранное до остановки ⏹")
+        else:
+            progress_bar.progress(100, text="Готово ✅")
 
         st.subheader("Результат")
         st.write(f"Собрано RU-отзывов: **{len(df)}**")
         st.dataframe(df, use_container_width=True)
 
-        out_name = f"appstore_reviews_all_countries_{extract_app_id(app_url)}_{datetime.now().strftime('%Y%m%d')}.csv"
-        csv_bytes = df.to_csv(index=False, encoding="utf-8", quoting=csv.QUOTE_ALL).encode("utf-8")
+        st.caption(
+            f"Запросов: {run_stats.get('requests', 0)} · повторов: {run_stats.get('retries', 0)} "
+            f"({run_stats.get('retry_spend', 0):.0%} от первых попыток, отказано {run_stats.get('retries_denied', 0)}) · "
+            f"сэкономлено запросов: {run_stats.get('requests_saved', 0)} · "
+            f"по сети: {run_stats.get('bytes_wire', 0) / 1024:.0f} КБ "
+            f"(распаковано {run_stats.get('bytes_decoded', 0) / 1024:.0f} КБ, {run_stats.get('http_version') or '—'}) · "
+            f"HTTP-кэш: {http_cache_hit_rate(run_stats):.0%}"
+            + (
+                f" · дублей: {run_stats.get('hedges_fired', 0)} (выиграли {run_stats.get('hedges_won', 0)}, "
+                f"p99 быстрее на ≥{run_stats.get('hedge_p99_saved_ms', 0):.0f} мс)"
+                if hedging_used else ""
+            )
+            + (
+                f" · ранняя остановка: {run_stats.get('early_stops', 0)} стран, "
+                f"сэкономлено ~{run_stats.get('early_stop_requests_saved', 0)} запросов, "
+                f"ожидаемо упущено ~{run_stats.get('early_stop_expected_missed', 0):.1f} RU-отзывов"
+                if early_stop_used else ""
+            )
+            + (
+                f" · продолжен прерванный сбор: готовых стран {run_stats.get('resumed_countries', 0)}, "
+                f"страниц {run_stats.get('resumed_pages', 0)}"
+                if run_stats.get("resumed_pages") or run_stats.get("resumed_countries") else ""
+            )
+        )
+
+        coverage = run_stats.get("coverage") or {}
+        skipped = run_stats.get("skipped") or {}
+        if coverage:
+            counts = pd.Series(coverage).value_counts()
+            summary = " · ".join(f"{status}: {counts.get(status, 0)}" for status in ("finished", "partial", "skipped"))
+            with st.expander(f"Покрытие стран — {summary}"):
+                st.dataframe(
+                    pd.DataFrame(
+                        [(c, status, skipped.get(c, "")) for c, status in coverage.items()],
+                        columns=["country", "status", "reason"],
+                    ),
+                    use_container_width=True,
+                )
+
+        finished = datetime.fromtimestamp(result.version) if result.version else datetime.now()
+        out_name = f"appstore_reviews_all_countries_{extract_app_id(result.app_url)}_{finished.strftime('%Y%m%d')}.csv"
 
         st.download_button(
             label="⬇️ Скачать CSV",
-            data=csv_bytes,
+            data=result.csv_bytes,
             file_name=out_name,
             mime="text/csv",
         )
 
-    except Exception as e:
-        progress_bar.progress(0, text="Ошибка ❌")
-        st.error(f"Ошибка: {e}")
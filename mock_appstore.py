@@ -0,0 +1,349 @@
+# mock_appstore.py
+# ===========================================
+# Локальный mock App Store для нагрузочных проверок app.py без обращения к Apple:
+# - /lookup?id=1,2&country=xx — как iTunes Lookup (в т.ч. несколько id через запятую)
+# - /{country}/rss/customerreviews/page=N/id=ID/sortby=mostrecent/json — как RSS JSON
+# - синтетические отзывы на нескольких языках (доля RU зависит от страны)
+# - задержки (логнормальное распределение), доля 429/5xx, Retry-After, отказы витрин
+# - ETag/If-None-Match и gzip, как у настоящего сервера
+# - всё детерминировано при заданном --seed
+#
+# Запуск:
+#   python mock_appstore.py --port 8765 --seed 42 --rate-429 0.05 --outage kz
+#   ITUNES_BASE_URL=http://127.0.0.1:8765 streamlit run app.py
+# ===========================================
+
+import re
+import json
+import gzip
+import time
+import random
+import hashlib
+import argparse
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+
+# -----------------------------
+# Настройки сервера
+# -----------------------------
+@dataclass
+class MockConfig:
+    seed: int = 42
+    latency_median_ms: float = 80.0
+    latency_sigma: float = 0.6
+    rate_429: float = 0.0
+    rate_5xx: float = 0.0
+    retry_after: int | None = None
+    outages: set[str] = field(default_factory=set)
+    outage_mode: str = "503"  # 503 | hang
+    slow_countries: dict[str, float] = field(default_factory=dict)  # страна -> множитель задержки
+    availability: float = 0.6
+    volume_scale: float = 1.0
+
+
+# -----------------------------
+# Синтетические данные: доступность, объём и язык отзывов по стране
+# -----------------------------
+RU_SHARE = {
+    "ru": 0.95, "by": 0.85, "kz": 0.7, "kg": 0.6, "tj": 0.5, "tm": 0.5,
+    "uz": 0.4, "ua": 0.4, "md": 0.3, "am": 0.3, "az": 0.3, "ge": 0.2,
+    "lv": 0.2, "ee": 0.15, "lt": 0.1, "il": 0.1,
+}
+ALWAYS_AVAILABLE = {"us", "gb", "de", "fr", "es", "br", "jp"} | set(RU_SHARE)
+
+# отзывов в день у "среднего" приложения
+DAILY_VOLUME = {
+    "us": 300, "gb": 60, "de": 50, "fr": 45, "br": 70, "jp": 40, "es": 35,
+    "ru": 40, "ua": 12, "kz": 8, "by": 5,
+}
+LOCAL_LANGUAGE = {
+    "us": "en", "gb": "en", "ca": "en", "au": "en", "nz": "en", "ie": "en", "in": "en",
+    "de": "de", "at": "de", "ch": "de",
+    "fr": "fr", "be": "fr", "lu": "fr",
+    "es": "es", "mx": "es", "ar": "es", "co": "es", "cl": "es", "pe": "es",
+    "br": "pt", "pt": "pt",
+}
+
+REVIEW_TEXTS = {
+    "ru": [
+        ("Отличное приложение", "Занимаюсь каждый день, серия уже больше ста дней, очень мотивирует"),
+        ("Слишком много рекламы", "После каждого урока реклама, без подписки пользоваться тяжело"),
+        ("Вылетает", "После обновления приложение вылетает и зависает на загрузке урока"),
+        ("Дорогая подписка", "Цена подписки выросла, пробный период короткий, оформил возврат"),
+        ("Хорошее обучение", "Первые шаги понятные, регистрация простая, напоминания помогают"),
+    ],
+    "en": [
+        ("Great app", "I keep my daily streak going and the reminders really help my motivation"),
+        ("Too many ads", "There are too many ads after every lesson, the video ad cannot be skipped"),
+        ("Crashes", "The app crashes and freezes after the latest update, not working at all"),
+        ("Pricey", "The subscription price went up and the free trial is too short for me"),
+    ],
+    "de": [
+        ("Super", "Die Tagesserie motiviert mich jeden Tag, die Erinnerungen sind hilfreich"),
+        ("Zu viel Werbung", "Nach jeder Lektion kommt Werbung, das Abo ist zu teuer geworden"),
+    ],
+    "fr": [
+        ("Génial", "La série quotidienne me motive beaucoup, les rappels sont utiles"),
+        ("Trop de publicité", "Trop de publicité après chaque leçon, l abonnement coûte cher"),
+    ],
+    "es": [
+        ("Muy buena", "Mantengo la racha diaria y los recordatorios me ayudan con la motivación"),
+        ("Demasiados anuncios", "Hay demasiados anuncios y la suscripción es muy cara ahora"),
+    ],
+    "pt": [
+        ("Ótimo", "Mantenho a sequência diária e os lembretes ajudam muito no progresso"),
+        ("Muitos anúncios", "Muitos anúncios depois de cada lição, a assinatura ficou cara"),
+    ],
+}
+
+RSS_PAGE_SIZE = 50
+RSS_MAX_PAGES = 10
+
+
+def _stable_rng(*parts) -> random.Random:
+    digest = hashlib.sha256(":".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+    return random.Random(int(digest[:16], 16))
+
+def is_available(cfg: MockConfig, app_id: str, country: str) -> bool:
+    if country in ALWAYS_AVAILABLE:
+        return True
+    return _stable_rng(cfg.seed, "avail", app_id, country).random() < cfg.availability
+
+def daily_volume(cfg: MockConfig, app_id: str, country: str) -> float:
+    base = DAILY_VOLUME.get(country)
+    if base is None:
+        base = _stable_rng(cfg.seed, "volume", app_id, country).uniform(0.05, 3.0)
+    return base * cfg.volume_scale
+
+def generate_reviews(cfg: MockConfig, app_id: str, country: str, now: datetime) -> list[dict]:
+    # до 500 отзывов (10 страниц RSS), от свежих к старым, с экспоненциальными интервалами
+    rng = _stable_rng(cfg.seed, "reviews", app_id, country)
+    per_day = daily_volume(cfg, app_id, country)
+    ru_share = RU_SHARE.get(country, 0.02)
+    local = LOCAL_LANGUAGE.get(country, "en")
+
+    reviews = []
+    t = now
+    for i in range(RSS_PAGE_SIZE * RSS_MAX_PAGES):
+        t -= timedelta(days=rng.expovariate(per_day))
+        lang = "ru" if rng.random() < ru_share else local
+        title, text = rng.choice(REVIEW_TEXTS[lang])
+        reviews.append({
+            "author": {"name": {"label": f"user_{country}_{i}"}, "uri": {"label": ""}},
+            "updated": {"label": t.replace(microsecond=0).isoformat()},
+            "im:rating": {"label": str(rng.randint(1, 5))},
+            "im:version": {"label": f"7.{rng.randint(0, 30)}.0"},
+            "id": {"label": str(10_000_000_000 + int(hashlib.sha256(f"{app_id}:{country}:{i}".encode()).hexdigest()[:9], 16))},
+            "title": {"label": title},
+            "content": {"label": f"{text} ({i})", "attributes": {"type": "text"}},
+        })
+    return reviews
+
+
+# -----------------------------
+# Состояние сервера: сгенерированные ленты + генератор сбоев
+# -----------------------------
+class MockState:
+    def __init__(self, cfg: MockConfig):
+        self.cfg = cfg
+        self.now = datetime.now(timezone.utc)
+        self._reviews: dict[tuple[str, str], list[dict]] = {}
+        self._rng = random.Random(cfg.seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+
+    def reviews(self, app_id: str, country: str) -> list[dict]:
+        key = (app_id, country)
+        with self._lock:
+            if key not in self._reviews:
+                self._reviews[key] = generate_reviews(self.cfg, app_id, country, self.now)
+            return self._reviews[key]
+
+    def draw(self) -> tuple[float, float]:
+        # (случайное для сбоя, множитель задержки) — из одного генератора под замком
+        with self._lock:
+            self.requests += 1
+            return self._rng.random(), self._rng.lognormvariate(0.0, self.cfg.latency_sigma)
+
+def lookup_payload(cfg: MockConfig, ids: list[str], country: str) -> dict:
+    results = []
+    for app_id in ids:
+        if not app_id.isdigit() or not is_available(cfg, app_id, country):
+            continue
+        results.append({
+            "trackId": int(app_id),
+            "trackName": f"Mock App {app_id}",
+            "version": "7.30.0",
+            "primaryGenreName": "Education",
+            "averageUserRating": 4.7,
+            "userRatingCount": 1000,
+            "currency": "USD",
+        })
+    return {"resultCount": len(results), "results": results}
+
+def rss_payload(state: MockState, app_id: str, country: str, page: int) -> dict:
+    feed = {"author": {"name": {"label": "iTunes Store"}}, "title": {"label": "iTunes Store: Customer Reviews"}}
+    if not is_available(state.cfg, app_id, country) or not 1 <= page <= RSS_MAX_PAGES:
+        return {"feed": feed}
+
+    chunk = state.reviews(app_id, country)[(page - 1) * RSS_PAGE_SIZE: page * RSS_PAGE_SIZE]
+    entries = list(chunk)
+    if page == 1:
+        entries.insert(0, {"im:name": {"label": f"Mock App {app_id}"}, "id": {"label": app_id}})
+    if entries:
+        feed["entry"] = entries
+    return {"feed": feed}
+
+
+# -----------------------------
+# HTTP-обработчик
+# -----------------------------
+RSS_PATH_RE = re.compile(r"^/([a-z]{2})/rss/customerreviews/page=(\d+)/id=(\d+)(?:/sortby=\w+)?/json$")
+
+class MockHandler(BaseHTTPRequestHandler):
+    state: MockState  # выставляется в make_server
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query)
+        m = RSS_PATH_RE.match(parts.path)
+        if parts.path == "/lookup":
+            country = (query.get("country") or ["us"])[0].lower()
+            ids = ",".join(query.get("id") or []).split(",")
+            route = ("lookup", country)
+        elif m:
+            country = m.group(1)
+            route = ("rss", country)
+        else:
+            self._send(404, b"not found", "text/plain")
+            return
+
+        if self._inject_faults(country):
+            return
+
+        if route[0] == "lookup":
+            payload = lookup_payload(self.state.cfg, [i for i in ids if i], country)
+        else:
+            payload = rss_payload(self.state, m.group(3), country, int(m.group(2)))
+        self._send_json(payload)
+
+    def _inject_faults(self, country: str) -> bool:
+        cfg = self.state.cfg
+        if country in cfg.outages:
+            if cfg.outage_mode == "hang":
+                time.sleep(60)
+            self._send(503, b"storefront outage", "text/plain", retry_after=cfg.retry_after)
+            return True
+
+        roll, latency_factor = self.state.draw()
+        time.sleep(cfg.latency_median_ms / 1000.0 * latency_factor * cfg.slow_countries.get(country, 1.0))
+
+        if roll < cfg.rate_429:
+            self._send(429, b"too many requests", "text/plain", retry_after=cfg.retry_after)
+            return True
+        if roll < cfg.rate_429 + cfg.rate_5xx:
+            status = (500, 502, 503, 504)[int(roll * 1000) % 4]
+            self._send(status, b"server error", "text/plain", retry_after=cfg.retry_after if status == 503 else None)
+            return True
+        return False
+
+    def _send_json(self, payload: dict):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self._send(304, b"", None, etag=etag)
+            return
+        self._send(200, body, "application/json; charset=utf-8", etag=etag)
+
+    def _send(self, status: int, body: bytes, content_type: str | None, retry_after: int | None = None, etag: str | None = None):
+        encoding = None
+        if body and "gzip" in (self.headers.get("Accept-Encoding") or ""):
+            body = gzip.compress(body)
+            encoding = "gzip"
+
+        self.send_response(status)
+        if content_type:
+            self.send_header("Content-Type", content_type)
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        if etag:
+            self.send_header("ETag", etag)
+        if retry_after is not None:
+            self.send_header("Retry-After", str(retry_after))
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            try:
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                # клиент отменил запрос (хедж, дедлайн) — для настоящего сервера это норма
+                self.close_connection = True
+
+
+def make_server(cfg: MockConfig, host: str = "127.0.0.1", port: int = 8765) -> ThreadingHTTPServer:
+    handler = type("BoundMockHandler", (MockHandler,), {"state": MockState(cfg)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+def _parse_slow(values: list[str]) -> dict[str, float]:
+    out = {}
+    for v in values:
+        country, _, factor = v.partition("=")
+        out[country.lower()] = float(factor or 5.0)
+    return out
+
+def main(argv: list[str] | None = None):
+    p = argparse.ArgumentParser(description="Локальный mock App Store (iTunes Lookup + RSS customerreviews)")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--latency-median-ms", type=float, default=80.0)
+    p.add_argument("--latency-sigma", type=float, default=0.6, help="sigma логнормального множителя задержки")
+    p.add_argument("--rate-429", type=float, default=0.0, help="доля ответов 429")
+    p.add_argument("--rate-5xx", type=float, default=0.0, help="доля ответов 500/502/503/504")
+    p.add_argument("--retry-after", type=int, default=None, help="Retry-After (сек) для 429/503")
+    p.add_argument("--outage", action="append", default=[], help="страна с постоянным отказом; можно несколько")
+    p.add_argument("--outage-mode", choices=["503", "hang"], default="503")
+    p.add_argument("--slow", action="append", default=[], help="медленная страна: cc=множитель, напр. kz=10")
+    p.add_argument("--availability", type=float, default=0.6, help="доля витрин, где приложение доступно")
+    p.add_argument("--volume-scale", type=float, default=1.0, help="множитель числа отзывов в день")
+    args = p.parse_args(argv)
+
+    cfg = MockConfig(
+        seed=args.seed,
+        latency_median_ms=args.latency_median_ms,
+        latency_sigma=args.latency_sigma,
+        rate_429=args.rate_429,
+        rate_5xx=args.rate_5xx,
+        retry_after=args.retry_after,
+        outages={c.lower() for o in args.outage for c in o.split(",") if c},
+        outage_mode=args.outage_mode,
+        slow_countries=_parse_slow(args.slow),
+        availability=args.availability,
+        volume_scale=args.volume_scale,
+    )
+    server = make_server(cfg, args.host, args.port)
+    print(f"mock App Store: http://{args.host}:{args.port}  (ITUNES_BASE_URL=http://{args.host}:{args.port})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import importlib.util
+import os
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from mock_appstore import MockConfig, make_server  # noqa: E402
+
+APP_URL = "https://apps.apple.com/ru/app/x/id570060128"
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    # app.py — скрипт Streamlit: при импорте рисует UI в bare-режиме и заводит очередь сборов,
+    # поэтому база состояния до импорта уводится во временный каталог
+    os.environ["APPSTORE_STATE_DB"] = str(tmp_path_factory.mktemp("import") / "state.sqlite3")
+    spec = importlib.util.spec_from_file_location("app", ROOT / "app.py")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["app"] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def state_db(app, tmp_path, monkeypatch):
+    # у каждого теста своя база: кэши, доходность, отметки и чекпоинты не перетекают между тестами
+    path = str(tmp_path / "state.sqlite3")
+    monkeypatch.setattr(app, "STATE_DB_PATH", path)
+    return path
+
+
+@pytest.fixture
+def mock_store(app, state_db, monkeypatch):
+    # запускает mock_appstore.py в этом процессе и направляет на него app.py
+    servers = []
+
+    def start(**cfg):
+        server = make_server(MockConfig(**cfg), port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        monkeypatch.setattr(app, "ITUNES_BASE_URL", base)
+        monkeypatch.setattr(app, "ITUNES_LOOKUP_URL", f"{base}/lookup")
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def scrape(app, mock_store):
+    # сбор по mock без общего bucket и с быстрым стартом темпа; параметры — как у ScrapeOptions
+    def run(**options):
+        options.setdefault("shared_rate", None)
+        options.setdefault("initial_rate", 50.0)
+        options.setdefault("max_rate", 200.0)
+        return app.scrape_appstore_reviews_all_countries(APP_URL, **options)
+
+    return run
@@ -0,0 +1,79 @@
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+
+def test_parse_retry_after_seconds(app):
+    assert app.parse_retry_after("7") == 7.0
+    assert app.parse_retry_after(" 0 ") == 0.0
+
+
+def test_parse_retry_after_http_date(app):
+    when = datetime.now(timezone.utc) + timedelta(seconds=30)
+    assert app.parse_retry_after(format_datetime(when, usegmt=True)) == pytest.approx(30, abs=2)
+    past = datetime.now(timezone.utc) - timedelta(hours=1)
+    assert app.parse_retry_after(format_datetime(past, usegmt=True)) == 0.0
+
+
+@pytest.mark.parametrize("value", [None, "", "soon", "-5", "1.5"])
+def test_parse_retry_after_garbage(app, value):
+    assert app.parse_retry_after(value) is None
+
+
+def test_chance_of_keepable_bounds_and_monotonicity(app):
+    a, b = app.EARLY_STOP_PRIOR
+    chances = [app.chance_of_keepable(a, b, 0, scanned, 50) for scanned in (0, 50, 200, 1000)]
+    assert all(0.0 < c < 1.0 for c in chances)
+    # чем больше просмотрено без единого RU, тем меньше шанс найти его дальше
+    assert chances == sorted(chances, reverse=True)
+    assert chances[-1] < 0.1
+
+
+def test_chance_of_keepable_grows_with_kept_and_page_size(app):
+    a, b = app.EARLY_STOP_PRIOR
+    assert app.chance_of_keepable(a, b, 5, 100, 50) > app.chance_of_keepable(a, b, 0, 100, 50)
+    assert app.chance_of_keepable(a, b, 0, 100, 50) > app.chance_of_keepable(a, b, 0, 100, 5)
+    assert app.chance_of_keepable(a, b, 0, 100, 0) == pytest.approx(0.0)
+
+
+def test_ru_rate_prior_caps_history_weight(app):
+    y = app.StorefrontYield(requests=100, scanned=10_000, kept=5_000, runs=10)
+    a, b = app.ru_rate_prior(y)
+    assert a + b == pytest.approx(sum(app.EARLY_STOP_PRIOR) + app.EARLY_STOP_PRIOR_STRENGTH)
+    assert app.ru_rate_prior(None) == app.EARLY_STOP_PRIOR
+
+
+def _yield(app, per_request: float, runs: int = 1, zero_runs: int = 0, age: float = 0.0):
+    return app.StorefrontYield(
+        requests=10, scanned=100, kept=per_request * 10, runs=runs, zero_runs=zero_runs,
+        updated_at=time.time() - age,
+    )
+
+
+def test_plan_countries_by_yield_orders_groups(app):
+    yields = {
+        "de": _yield(app, 0.5),
+        "ru": _yield(app, 3.0),
+        "us": _yield(app, 0.0),
+        "kz": _yield(app, 1.0),
+    }
+    order, skipped = app.plan_countries_by_yield(["us", "de", "fr", "ru", "kz", "gb"], yields)
+    # доходные по убыванию, затем без истории в исходном порядке, в конце нулевые
+    assert order == ["ru", "kz", "de", "fr", "gb", "us"]
+    assert skipped == {}
+
+
+def test_plan_countries_by_yield_skips_zero_runs_until_recheck(app):
+    yields = {
+        "us": _yield(app, 0.0, runs=3, zero_runs=3),
+        "gb": _yield(app, 0.0, runs=3, zero_runs=3, age=app.YIELD_RECHECK_AFTER + 1),
+        "de": _yield(app, 0.0, runs=1, zero_runs=1),
+    }
+    order, skipped = app.plan_countries_by_yield(["us", "gb", "de"], yields, skip_zero_yield_runs=2)
+    assert list(skipped) == ["us"]
+    assert order == ["gb", "de"]
+
+    order, skipped = app.plan_countries_by_yield(["us", "gb", "de"], yields)
+    assert skipped == {} and sorted(order) == ["de", "gb", "us"]
@@ -0,0 +1,125 @@
+import sqlite3
+import time
+from dataclasses import replace
+
+from conftest import APP_URL
+
+COUNTRIES = ["ru", "by", "kz", "ua", "us", "de", "am", "ge"]
+
+
+def _stats(df):
+    return df.attrs["run_stats"]
+
+
+def test_cancel_returns_partial_frame(app, mock_store):
+    mock_store(seed=3, latency_median_ms=150)
+    handle = app.start_scrape_appstore_reviews_all_countries(
+        APP_URL, days=30, per_country_limit=500, deep_history=True, concurrency=2,
+        use_http_cache=False, use_lookup_cache=False, countries=COUNTRIES, shared_rate=None,
+    )
+    started = time.monotonic()
+    while time.monotonic() - started < 30:
+        progress = handle.progress[0] if handle.progress else None
+        if progress is not None and progress.kept > 0:
+            break
+        time.sleep(0.05)
+    else:
+        raise AssertionError("сбор не дошёл до первых отзывов")
+
+    cancelled_at = time.monotonic()
+    handle.cancel()
+    df = handle.wait(timeout=5)
+    rs = _stats(df)
+
+    assert time.monotonic() - cancelled_at < 2
+    assert rs["cancelled"]
+    assert len(df) > 0
+    assert "сбор остановлен" in rs["skipped"].values()
+    assert set(rs["coverage"]) == set(COUNTRIES)
+    assert set(rs["coverage"].values()) != {"finished"}
+
+
+def test_deadline_reports_coverage(mock_store, scrape):
+    mock_store(seed=3, latency_median_ms=150)
+    started = time.monotonic()
+    df = scrape(
+        days=30, per_country_limit=500, deep_history=True, concurrency=2, deadline=1.5,
+        use_http_cache=False, use_lookup_cache=False, countries=COUNTRIES,
+    )
+    rs = _stats(df)
+
+    assert time.monotonic() - started < 5
+    assert not rs["cancelled"]
+    assert set(rs["coverage"]) == set(COUNTRIES)
+    unfinished = [c for c, status in rs["coverage"].items() if status != "finished"]
+    assert unfinished
+    assert all(rs["skipped"][c] == "не успели до дедлайна" for c in unfinished)
+
+
+def test_checkpoint_resume_gives_identical_ids(mock_store, scrape, state_db):
+    mock_store(seed=3, latency_median_ms=100)
+    options = dict(
+        days=30, per_country_limit=500, deep_history=True, concurrency=4,
+        use_http_cache=False, use_lookup_cache=False, countries=COUNTRIES,
+    )
+    full = scrape(resume=False, **options)
+
+    interrupted = scrape(deadline=1.0, **options)
+    assert set(_stats(interrupted)["coverage"].values()) != {"finished"}
+    resumed = scrape(**options)
+    rs = _stats(resumed)
+
+    # недоделанные витрины продолжают со следующей страницы, а не с первой
+    assert rs["resumed_pages"] > 0
+    assert sorted(resumed["review_id"]) == sorted(full["review_id"])
+    assert resumed["review_id"].is_unique
+    with sqlite3.connect(state_db) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM sweep_checkpoints").fetchone() == (0,)
+
+
+def test_http_cache_revalidates_with_304(app, mock_store, scrape, monkeypatch):
+    mock_store(seed=3, latency_median_ms=10)
+    # ленту сразу считаем несвежей — второй прогон обязан спросить сервер с If-None-Match
+    policy = app.HTTP_CACHE_POLICIES["rss"]
+    monkeypatch.setitem(app.HTTP_CACHE_POLICIES, "rss", replace(policy, fresh_for=0))
+    options = dict(days=30, countries=["ru", "by", "kz"], use_http_cache=True)
+
+    first = scrape(**options)
+    second = scrape(**options)
+
+    assert _stats(first)["http_cache_revalidated"] == 0
+    assert _stats(second)["http_cache_revalidated"] > 0
+    assert _stats(second)["http_cache_misses"] == 0
+    assert sorted(second["review_id"]) == sorted(first["review_id"])
+
+
+def test_max_requests_caps_the_run(mock_store, scrape):
+    mock_store(seed=3, latency_median_ms=10)
+    df = scrape(
+        days=30, per_country_limit=300, deep_history=True, max_requests=15,
+        use_http_cache=False, use_lookup_cache=False, countries=COUNTRIES,
+    )
+    rs = _stats(df)
+
+    assert rs["requests"] <= 15
+    assert rs["budget_denied"] > 0
+    assert len(df) > 0
+
+
+def test_incremental_run_stops_at_marks(mock_store, scrape, state_db):
+    mock_store(seed=3, latency_median_ms=10)
+    options = dict(
+        days=30, per_country_limit=300, incremental=True, use_http_cache=False,
+        countries=["ru", "by", "kz"],
+    )
+    first = scrape(**options)
+    assert len(first) > 0
+    with sqlite3.connect(state_db) as conn:
+        marked = {row[0] for row in conn.execute("SELECT country FROM high_water_marks")}
+    assert marked == set(first["country"])
+
+    second = scrape(**options)
+    rs = _stats(second)
+    assert rs["known_reached"] > 0
+    assert len(second) == 0
+    assert rs["requests"] < _stats(first)["requests"]